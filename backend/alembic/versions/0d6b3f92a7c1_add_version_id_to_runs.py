@@ -0,0 +1,30 @@
+"""Add version_id to runs
+
+Revision ID: 0d6b3f92a7c1
+Revises: e5a2d8c41f07
+Create Date: 2026-10-18 12:25:09.664820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d6b3f92a7c1'
+down_revision: Union[str, None] = 'e5a2d8c41f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.add_column(sa.Column('version_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('runs_version_id_fkey', 'versions', ['version_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.drop_constraint('runs_version_id_fkey', type_='foreignkey')
+        batch_op.drop_column('version_id')
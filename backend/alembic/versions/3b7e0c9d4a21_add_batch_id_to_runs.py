@@ -0,0 +1,28 @@
+"""Add batch id to runs
+
+Revision ID: 3b7e0c9d4a21
+Revises: f19d6a3c8e52
+Create Date: 2026-10-18 18:32:07.518264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e0c9d4a21'
+down_revision: Union[str, None] = 'f19d6a3c8e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.drop_column('batch_id')
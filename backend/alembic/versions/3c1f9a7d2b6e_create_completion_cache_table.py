@@ -0,0 +1,33 @@
+"""Create completion_cache table
+
+Revision ID: 3c1f9a7d2b6e
+Revises: 8faec0662064
+Create Date: 2026-10-18 09:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2b6e'
+down_revision: Union[str, None] = '8faec0662064'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('completion_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('output', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_completion_cache_created_at'), 'completion_cache', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_completion_cache_created_at'), table_name='completion_cache')
+    op.drop_table('completion_cache')
@@ -0,0 +1,61 @@
+"""Add prompt lookup indexes
+
+Revision ID: 5e8b2f71c9d4
+Revises: 9a4c7e13b58d
+Create Date: 2026-10-18 14:22:09.318644
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b2f71c9d4'
+down_revision: Union[str, None] = '9a4c7e13b58d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Concurrent version creation could hand out the same number twice;
+    # renumber those prompts' versions in (number, id) order first
+    bind = op.get_bind()
+    versions = sa.table(
+        'versions',
+        sa.column('id', sa.Integer),
+        sa.column('number', sa.Integer),
+    )
+    duplicated = bind.execute(
+        sa.text(
+            "SELECT DISTINCT prompt_id FROM versions "
+            "GROUP BY prompt_id, number HAVING COUNT(*) > 1"
+        )
+    ).scalars().all()
+    for prompt_id in duplicated:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id FROM versions WHERE prompt_id = :prompt_id "
+                "ORDER BY number, id"
+            ),
+            {'prompt_id': prompt_id},
+        ).scalars().all()
+        for number, version_id in enumerate(rows, start=1):
+            bind.execute(
+                versions.update()
+                .where(versions.c.id == version_id)
+                .values(number=number)
+            )
+
+    op.create_index('ix_test_cases_prompt_id_id', 'test_cases', ['prompt_id', 'id'], unique=False)
+    op.create_index('ix_versions_prompt_id_number', 'versions', ['prompt_id', 'number'], unique=True)
+    op.create_index('ix_run_logs_prompt_id_created_at', 'run_logs', ['prompt_id', 'created_at'], unique=False)
+    op.create_index('ix_prompts_user_id_created_at', 'prompts', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_prompts_user_id_created_at', table_name='prompts')
+    op.drop_index('ix_run_logs_prompt_id_created_at', table_name='run_logs')
+    op.drop_index('ix_versions_prompt_id_number', table_name='versions')
+    op.drop_index('ix_test_cases_prompt_id_id', table_name='test_cases')
@@ -0,0 +1,144 @@
+"""Partition run_logs by month and add daily rollups
+
+Revision ID: 7c3e9b05d1a8
+Revises: 5e8b2f71c9d4
+Create Date: 2026-10-18 15:06:44.127390
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e9b05d1a8'
+down_revision: Union[str, None] = '5e8b2f71c9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Monthly partitions created ahead of the current month
+PARTITIONS_AHEAD = 2
+
+RUN_LOG_INDEXES = [
+    ('ix_run_logs_id', ['id']),
+    ('ix_run_logs_run_id', ['run_id']),
+    ('ix_run_logs_system_prompt_id', ['system_prompt_id']),
+    ('ix_run_logs_prompt_id_created_at', ['prompt_id', 'created_at']),
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_run_log_constraints() -> None:
+    op.create_foreign_key('run_logs_user_id_fkey', 'run_logs', 'users', ['user_id'], ['id'])
+    op.create_foreign_key('run_logs_prompt_id_fkey', 'run_logs', 'prompts', ['prompt_id'], ['id'], ondelete='SET NULL')
+    op.create_foreign_key('run_logs_run_id_fkey', 'run_logs', 'runs', ['run_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('run_logs_test_case_id_fkey', 'run_logs', 'test_cases', ['test_case_id'], ['id'], ondelete='SET NULL')
+    op.create_foreign_key('run_logs_system_prompt_id_fkey', 'run_logs', 'system_prompts', ['system_prompt_id'], ['id'])
+
+
+def _partition_run_logs() -> None:
+    """
+    Rebuild run_logs as a table range-partitioned by month on created_at. The
+    partition key has to be part of the primary key, so it becomes
+    (id, created_at) and created_at NOT NULL.
+    """
+    op.execute("ALTER TABLE run_logs RENAME TO run_logs_unpartitioned")
+    op.execute("ALTER TABLE run_logs_unpartitioned RENAME CONSTRAINT run_logs_pkey TO run_logs_unpartitioned_pkey")
+    for name, _ in RUN_LOG_INDEXES:
+        op.drop_index(name, table_name='run_logs_unpartitioned')
+    op.execute(
+        "UPDATE run_logs_unpartitioned SET created_at = timezone('utc', now()) "
+        "WHERE created_at IS NULL"
+    )
+
+    op.execute(
+        "CREATE TABLE run_logs (LIKE run_logs_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE run_logs ALTER COLUMN created_at SET NOT NULL")
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE run_logs_id_seq OWNED BY run_logs.id")
+    op.create_primary_key('run_logs_pkey', 'run_logs', ['id', 'created_at'])
+    _create_run_log_constraints()
+
+    oldest = op.get_bind().execute(
+        sa.text("SELECT min(created_at) FROM run_logs_unpartitioned")
+    ).scalar()
+    this_month = datetime.utcnow().date().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest else this_month
+    while month <= _add_months(this_month, PARTITIONS_AHEAD):
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE run_logs_{month:%Y_%m} PARTITION OF run_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+    op.execute("CREATE TABLE run_logs_default PARTITION OF run_logs DEFAULT")
+
+    op.execute("INSERT INTO run_logs SELECT * FROM run_logs_unpartitioned")
+    op.execute("DROP TABLE run_logs_unpartitioned")
+
+    for name, columns in RUN_LOG_INDEXES:
+        op.create_index(name, 'run_logs', columns, unique=False)
+
+
+def _unpartition_run_logs() -> None:
+    op.execute("CREATE TABLE run_logs_unpartitioned (LIKE run_logs INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO run_logs_unpartitioned SELECT * FROM run_logs")
+    op.execute("ALTER SEQUENCE run_logs_id_seq OWNED BY run_logs_unpartitioned.id")
+    # Drops every partition along with the parent
+    op.execute("DROP TABLE run_logs")
+    op.execute("ALTER TABLE run_logs_unpartitioned RENAME TO run_logs")
+    op.execute("ALTER TABLE run_logs ALTER COLUMN created_at DROP NOT NULL")
+    op.create_primary_key('run_logs_pkey', 'run_logs', ['id'])
+    _create_run_log_constraints()
+    for name, columns in RUN_LOG_INDEXES:
+        op.create_index(name, 'run_logs', columns, unique=False)
+
+
+def upgrade() -> None:
+    op.create_table('run_log_daily_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('prompt_id', sa.Integer(), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('cache_hits', sa.Integer(), nullable=False),
+    sa.Column('model_calls', sa.Integer(), nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False),
+    sa.Column('latency_ms', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['prompt_id'], ['prompts.id'], name='run_log_daily_rollups_prompt_id_fkey', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('day', 'prompt_id')
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_run_logs()
+    op.create_index('ix_run_logs_created_at', 'run_logs', ['created_at'], unique=False)
+
+    # Backfill: roll up every day already logged
+    op.execute(
+        "INSERT INTO run_log_daily_rollups (day, prompt_id, calls, errors, "
+        "cache_hits, model_calls, prompt_tokens, completion_tokens, latency_ms) "
+        "SELECT date(created_at), prompt_id, count(id), "
+        "count(id) FILTER (WHERE error), "
+        "count(id) FILTER (WHERE cached), "
+        "count(id) FILTER (WHERE NOT error AND NOT cached), "
+        "coalesce(sum(CASE WHEN NOT error AND NOT cached THEN prompt_tokens END), 0), "
+        "coalesce(sum(CASE WHEN NOT error AND NOT cached THEN completion_tokens END), 0), "
+        "coalesce(sum(CASE WHEN NOT error AND NOT cached THEN latency_ms END), 0) "
+        "FROM run_logs WHERE prompt_id IS NOT NULL AND created_at IS NOT NULL "
+        "GROUP BY date(created_at), prompt_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_run_logs_created_at', table_name='run_logs')
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_run_logs()
+    op.drop_table('run_log_daily_rollups')
@@ -0,0 +1,32 @@
+"""Add run_test_cases recording the test cases of sample runs
+
+Revision ID: 8d2a6f1c0b93
+Revises: 3b7e0c9d4a21
+Create Date: 2026-10-18 19:12:45.093716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2a6f1c0b93'
+down_revision: Union[str, None] = '3b7e0c9d4a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('run_test_cases',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('test_case_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], name='run_test_cases_run_id_fkey', ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], name='run_test_cases_test_case_id_fkey', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('run_id', 'test_case_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('run_test_cases')
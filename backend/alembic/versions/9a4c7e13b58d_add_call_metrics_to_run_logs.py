@@ -0,0 +1,36 @@
+"""Add call metrics to run_logs
+
+Revision ID: 9a4c7e13b58d
+Revises: 0d6b3f92a7c1
+Create Date: 2026-10-18 13:48:31.902455
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c7e13b58d'
+down_revision: Union[str, None] = '0d6b3f92a7c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.add_column(sa.Column('cached', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('completion_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('latency_ms', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('finish_reason', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.drop_column('finish_reason')
+        batch_op.drop_column('latency_ms')
+        batch_op.drop_column('completion_tokens')
+        batch_op.drop_column('prompt_tokens')
+        batch_op.drop_column('cached')
@@ -0,0 +1,28 @@
+"""Add revision to prompts
+
+Revision ID: a4d7c2e91f36
+Revises: 7c3e9b05d1a8
+Create Date: 2026-10-18 16:12:37.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d7c2e91f36'
+down_revision: Union[str, None] = '7c3e9b05d1a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('prompts') as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('prompts') as batch_op:
+        batch_op.drop_column('revision')
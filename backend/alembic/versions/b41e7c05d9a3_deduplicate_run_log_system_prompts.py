@@ -0,0 +1,98 @@
+"""Deduplicate run_logs system prompts
+
+Revision ID: b41e7c05d9a3
+Revises: 3c1f9a7d2b6e
+Create Date: 2026-10-18 10:02:17.530911
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e7c05d9a3'
+down_revision: Union[str, None] = '3c1f9a7d2b6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('system_prompts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_system_prompts_hash'), 'system_prompts', ['hash'], unique=True)
+    op.create_index(op.f('ix_system_prompts_id'), 'system_prompts', ['id'], unique=False)
+
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.add_column(sa.Column('system_prompt_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_run_logs_system_prompt_id'), ['system_prompt_id'], unique=False)
+        batch_op.create_foreign_key('run_logs_system_prompt_id_fkey', 'system_prompts', ['system_prompt_id'], ['id'])
+
+    # Backfill: store each distinct prompt once, then point run logs at it
+    bind = op.get_bind()
+    system_prompts = sa.table(
+        'system_prompts',
+        sa.column('hash', sa.String),
+        sa.column('content', sa.Text),
+        sa.column('created_at'),
+    )
+    distinct_prompts = bind.execute(
+        sa.text(
+            "SELECT system_prompt, MIN(created_at) FROM run_logs "
+            "WHERE system_prompt IS NOT NULL GROUP BY system_prompt"
+        )
+    )
+    batch = []
+    for content, created_at in distinct_prompts:
+        batch.append({
+            'hash': hashlib.sha256(content.encode('utf-8')).hexdigest(),
+            'content': content,
+            'created_at': created_at,
+        })
+        if len(batch) >= 1000:
+            bind.execute(system_prompts.insert(), batch)
+            batch = []
+    if batch:
+        bind.execute(system_prompts.insert(), batch)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE run_logs SET system_prompt_id = system_prompts.id "
+            "FROM system_prompts WHERE run_logs.system_prompt = system_prompts.content"
+        )
+    else:
+        op.execute(
+            "UPDATE run_logs SET system_prompt_id = ("
+            "SELECT system_prompts.id FROM system_prompts "
+            "WHERE system_prompts.content = run_logs.system_prompt)"
+        )
+
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.drop_column('system_prompt')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.add_column(sa.Column('system_prompt', sa.VARCHAR(), autoincrement=False, nullable=True))
+
+    op.execute(
+        "UPDATE run_logs SET system_prompt = ("
+        "SELECT system_prompts.content FROM system_prompts "
+        "WHERE system_prompts.id = run_logs.system_prompt_id)"
+    )
+
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.drop_constraint('run_logs_system_prompt_id_fkey', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_run_logs_system_prompt_id'))
+        batch_op.drop_column('system_prompt_id')
+
+    op.drop_index(op.f('ix_system_prompts_id'), table_name='system_prompts')
+    op.drop_index(op.f('ix_system_prompts_hash'), table_name='system_prompts')
+    op.drop_table('system_prompts')
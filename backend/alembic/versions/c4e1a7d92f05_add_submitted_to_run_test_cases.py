@@ -0,0 +1,28 @@
+"""Record the test cases sent in a batch run's batch
+
+Revision ID: c4e1a7d92f05
+Revises: 8d2a6f1c0b93
+Create Date: 2026-10-18 19:40:11.287354
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a7d92f05'
+down_revision: Union[str, None] = '8d2a6f1c0b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('run_test_cases') as batch_op:
+        batch_op.add_column(sa.Column('submitted', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('run_test_cases') as batch_op:
+        batch_op.drop_column('submitted')
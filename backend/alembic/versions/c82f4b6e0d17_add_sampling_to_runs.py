@@ -0,0 +1,32 @@
+"""Add sampling to runs
+
+Revision ID: c82f4b6e0d17
+Revises: a4d7c2e91f36
+Create Date: 2026-10-18 17:03:52.916048
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c82f4b6e0d17'
+down_revision: Union[str, None] = 'a4d7c2e91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.add_column(sa.Column('sample_fraction', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('sample_seed', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('sample_changed_first', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.drop_column('sample_changed_first')
+        batch_op.drop_column('sample_seed')
+        batch_op.drop_column('sample_fraction')
@@ -0,0 +1,70 @@
+"""Create runs table
+
+Revision ID: e5a2d8c41f07
+Revises: b41e7c05d9a3
+Create Date: 2026-10-18 11:40:52.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a2d8c41f07'
+down_revision: Union[str, None] = 'b41e7c05d9a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('prompt_id', sa.Integer(), nullable=True),
+    sa.Column('system_prompt_id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('max_concurrency', sa.Integer(), nullable=True),
+    sa.Column('bypass_cache', sa.Boolean(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['prompt_id'], ['prompts.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['system_prompt_id'], ['system_prompts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_runs_id'), 'runs', ['id'], unique=False)
+    op.create_index(op.f('ix_runs_status'), 'runs', ['status'], unique=False)
+
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.add_column(sa.Column('run_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('test_case_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('error', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.create_index(batch_op.f('ix_run_logs_run_id'), ['run_id'], unique=False)
+        batch_op.create_foreign_key('run_logs_run_id_fkey', 'runs', ['run_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('run_logs_test_case_id_fkey', 'test_cases', ['test_case_id'], ['id'], ondelete='SET NULL')
+
+    # Flag existing failed calls, which were logged with an error prefix
+    op.execute(
+        "UPDATE run_logs SET error = true "
+        "WHERE response LIKE 'OpenAI Error:%' OR response LIKE 'Internal Error:%'"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.drop_constraint('run_logs_test_case_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('run_logs_run_id_fkey', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_run_logs_run_id'))
+        batch_op.drop_column('error')
+        batch_op.drop_column('test_case_id')
+        batch_op.drop_column('run_id')
+
+    op.drop_index(op.f('ix_runs_status'), table_name='runs')
+    op.drop_index(op.f('ix_runs_id'), table_name='runs')
+    op.drop_table('runs')
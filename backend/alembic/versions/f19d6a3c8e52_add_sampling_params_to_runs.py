@@ -0,0 +1,41 @@
+"""Add sampling params to runs and sample index to run logs
+
+Revision ID: f19d6a3c8e52
+Revises: c82f4b6e0d17
+Create Date: 2026-10-18 17:48:21.604337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19d6a3c8e52'
+down_revision: Union[str, None] = 'c82f4b6e0d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.add_column(sa.Column('temperature', sa.Float(), server_default='0.7', nullable=False))
+        batch_op.add_column(sa.Column('top_p', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('max_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('seed', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('samples_per_case', sa.Integer(), server_default='1', nullable=False))
+    # On Postgres this reaches every monthly partition of run_logs
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.add_column(sa.Column('sample_index', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('run_logs') as batch_op:
+        batch_op.drop_column('sample_index')
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.drop_column('samples_per_case')
+        batch_op.drop_column('seed')
+        batch_op.drop_column('max_tokens')
+        batch_op.drop_column('top_p')
+        batch_op.drop_column('temperature')
@@ -0,0 +1,106 @@
+"""
+Local stand-in for the Azure OpenAI chat completions endpoint.
+
+Responds to `POST /openai/deployments/{deployment}/chat/completions` after a
+configurable, log-normally distributed delay and fails a configurable fraction
+of calls with 429 (with `Retry-After`) or 500 responses.
+
+Run standalone with:
+
+    python -m bench.fake_llm --port 8100 --latency-ms 800 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(
+    latency_ms: float = 500.0,
+    latency_sigma: float = 0.5,
+    error_rate: float = 0.0,
+    rate_limit_share: float = 0.5,
+    seed: int = None,
+) -> FastAPI:
+    """
+    Build the fake server.
+
+    - **latency_ms**: median response delay
+    - **latency_sigma**: sigma of the log-normal delay distribution
+    - **error_rate**: fraction of calls that fail
+    - **rate_limit_share**: fraction of failures returned as 429 instead of 500
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(
+            rng.lognormvariate(math.log(latency_ms / 1000.0), latency_sigma)
+        )
+
+        if rng.random() < error_rate:
+            if rng.random() < rate_limit_share:
+                return JSONResponse(
+                    status_code=429,
+                    headers={"retry-after-ms": "200"},
+                    content={"error": {"code": "429", "message": "Rate limit"}},
+                )
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"code": "500", "message": "Server error"}},
+            )
+
+        user_message = body["messages"][-1]["content"]
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4 + 1
+        choices = []
+        for index in range(body.get("n") or 1):
+            content = f"Echo {index}: {user_message}"
+            choices.append(
+                {
+                    "index": index,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            )
+        completion_tokens = sum(
+            len(choice["message"]["content"]) // 4 + 1 for choice in choices
+        )
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.latency_sigma, args.error_rate),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
@@ -0,0 +1,249 @@
+"""
+End-to-end load test for the Prompt Profiler API.
+
+Boots the FastAPI app against a throwaway database (SQLite by default, or any
+DATABASE_URL such as Postgres), a local fake Azure OpenAI server and a stub auth
+verifier, then drives concurrent runs and CRUD traffic and reports requests/sec
+and p50/p95/p99 latency per endpoint.
+
+Run from the backend directory:
+
+    python -m bench.load_test --duration 30 --users 20 --test-cases 50 \\
+        --latency-ms 800 --error-rate 0.02
+
+Use `--json` to emit machine-readable results for comparing against a baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import uvicorn
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import fake_llm, stub_auth  # noqa: E402
+
+# Relative weight of each scenario in the traffic mix
+SCENARIOS = {
+    "run": 1,
+    "run_stream": 1,
+    "list_prompts": 4,
+    "list_test_cases": 4,
+    "list_versions": 3,
+    "create_test_case": 2,
+    "create_version": 1,
+}
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.failures[name] += 1
+
+    def report(self, elapsed: float) -> List[dict]:
+        rows = []
+        for name in sorted(self.latencies):
+            values = self.latencies[name]
+            rows.append(
+                {
+                    "endpoint": name,
+                    "requests": len(values),
+                    "failures": self.failures[name],
+                    "rps": len(values) / elapsed,
+                    "mean_ms": statistics.fmean(values) * 1000,
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                }
+            )
+        return rows
+
+
+async def seed_user(client: httpx.AsyncClient, token: str, test_cases: int) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    prompt = (
+        await client.post("/prompts/", json={"name": "bench"}, headers=headers)
+    ).json()
+    for i in range(test_cases):
+        await client.post(
+            f"/test-cases/?prompt_id={prompt['id']}",
+            json={"user_message": f"Benchmark message {i}"},
+            headers=headers,
+        )
+    await client.post(
+        "/versions/",
+        json={"prompt_id": prompt["id"], "system_prompt": "You are a benchmark."},
+        headers=headers,
+    )
+    return {"headers": headers, "prompt_id": prompt["id"]}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, name: str, user: dict, bypass_cache: bool
+) -> bool:
+    headers = user["headers"]
+    prompt_id = user["prompt_id"]
+    run_body = {"system_prompt": "You are a benchmark.", "bypass_cache": bypass_cache}
+    if name == "run":
+        response = await client.post(
+            f"/run/prompt/{prompt_id}", json=run_body, headers=headers
+        )
+    elif name == "run_stream":
+        async with client.stream(
+            "POST", f"/run/prompt/{prompt_id}/stream", json=run_body, headers=headers
+        ) as response:
+            async for _ in response.aiter_lines():
+                pass
+    elif name == "list_prompts":
+        response = await client.get("/prompts/", headers=headers)
+    elif name == "list_test_cases":
+        response = await client.get(f"/test-cases/prompt/{prompt_id}", headers=headers)
+    elif name == "list_versions":
+        response = await client.get(f"/versions/prompt/{prompt_id}", headers=headers)
+    elif name == "create_test_case":
+        response = await client.post(
+            f"/test-cases/?prompt_id={prompt_id}",
+            json={"user_message": "Benchmark message"},
+            headers=headers,
+        )
+    elif name == "create_version":
+        response = await client.post(
+            "/versions/",
+            json={"prompt_id": prompt_id, "system_prompt": "You are a benchmark."},
+            headers=headers,
+        )
+    else:
+        raise ValueError(name)
+    return response.status_code < 400
+
+
+async def drive(args, base_url: str) -> List[dict]:
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=args.timeout, limits=limits
+    ) as client:
+        users = [
+            await seed_user(client, f"bench-user-{i}", args.test_cases)
+            for i in range(args.users)
+        ]
+
+        recorder = Recorder()
+        names = list(SCENARIOS)
+        weights = [SCENARIOS[name] for name in names]
+        rng = random.Random(args.seed)
+        deadline = time.monotonic() + args.duration
+
+        async def virtual_user(user: dict) -> None:
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    ok = await run_scenario(client, name, user, args.bypass_cache)
+                except httpx.HTTPError:
+                    ok = False
+                recorder.record(name, time.perf_counter() - started, ok)
+
+        started = time.monotonic()
+        await asyncio.gather(*(virtual_user(user) for user in users))
+        return recorder.report(time.monotonic() - started)
+
+
+def print_report(rows: List[dict]) -> None:
+    header = f"{'endpoint':<18}{'reqs':>7}{'fail':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['endpoint']:<18}{row['requests']:>7}{row['failures']:>6}"
+            f"{row['rps']:>9.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--users", type=int, default=10, help="virtual users")
+    parser.add_argument("--test-cases", type=int, default=20, help="per user")
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--bypass-cache",
+        action="store_true",
+        help="always call the fake model instead of reusing cached completions",
+    )
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--llm-port", type=int, default=8100)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    start_server(
+        fake_llm.create_app(
+            args.latency_ms, args.latency_sigma, args.error_rate, seed=args.seed
+        ),
+        args.llm_port,
+    )
+
+    # Configure the app before it is imported; load_dotenv won't override these
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{args.llm_port}"
+    os.environ["AZURE_OPENAI_API_KEY"] = "bench"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2024-02-01"
+    os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"] = "bench"
+    os.environ.setdefault("ALLOWED_ORIGINS", "[]")
+    stub_auth.install()
+
+    from main import app
+
+    start_server(app, args.port)
+    rows = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}"))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
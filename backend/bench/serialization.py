@@ -0,0 +1,150 @@
+"""
+Serialization and compression benchmark for large run responses.
+
+Builds a `RunResponse` with many test cases of realistic message and output
+sizes, then reports how long each response class takes to encode it and how
+many bytes go on the wire uncompressed, gzipped and brotli-compressed (with
+the settings `CompressionMiddleware` uses).
+
+Run from the backend directory:
+
+    python -m bench.serialization --results 1000 --output-words 400
+
+Use `--json` to emit machine-readable results for comparing against a baseline.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+from fastapi.responses import JSONResponse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas.run import RunResponse, RunTestCase  # noqa: E402
+from utils.compression import Compressor  # noqa: E402
+from utils.metrics import TimedJSONResponse  # noqa: E402
+
+VOCABULARY_SIZE = 2000
+
+
+def build_response(results: int, message_words: int, output_words: int, seed: int):
+    """
+    A run response whose texts are drawn from a Zipf-distributed vocabulary
+    (with some non-ASCII words), which compresses roughly like English prose.
+    """
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyzéü"
+    vocabulary = [
+        "".join(rng.choice(letters) for _ in range(rng.randint(2, 10)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+    weights = [1 / rank for rank in range(1, VOCABULARY_SIZE + 1)]
+
+    def text(words: int) -> str:
+        return " ".join(rng.choices(vocabulary, weights, k=words))
+
+    return RunResponse(
+        run_id=1,
+        results=[
+            RunTestCase(
+                test_case_id=i,
+                user_message=text(message_words),
+                output=text(output_words),
+                prompt_tokens=rng.randint(50, 500),
+                completion_tokens=rng.randint(50, 800),
+                latency_ms=rng.uniform(200, 3000),
+                finish_reason="stop",
+            )
+            for i in range(results)
+        ],
+    )
+
+
+def time_ms(fn: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def run(args) -> List[dict]:
+    response = build_response(
+        args.results, args.message_words, args.output_words, args.seed
+    )
+    # What FastAPI hands the response class after validating the response model
+    content = response.model_dump(mode="json")
+
+    rows = []
+    for name, response_class in (
+        ("json", JSONResponse),
+        ("orjson", TimedJSONResponse),
+    ):
+        body = response_class(content).body
+        rows.append(
+            {
+                "variant": name,
+                "encode_ms": time_ms(lambda: response_class(content), args.repeat),
+                "compress_ms": 0.0,
+                "bytes": len(body),
+            }
+        )
+
+    body = TimedJSONResponse(content).body
+    for encoding in ("gzip", "br"):
+        compressed = Compressor(encoding).compress(body, finish=True)
+        rows.append(
+            {
+                "variant": f"orjson+{encoding}",
+                "encode_ms": rows[1]["encode_ms"],
+                "compress_ms": time_ms(
+                    lambda: Compressor(encoding).compress(body, finish=True),
+                    args.repeat,
+                ),
+                "bytes": len(compressed),
+            }
+        )
+    return rows
+
+
+def print_report(rows: List[dict]) -> None:
+    baseline = rows[0]
+    print(
+        f"{'variant':<14}{'encode ms':>11}{'speedup':>9}"
+        f"{'compress ms':>13}{'bytes':>12}{'smaller':>9}"
+    )
+    for row in rows:
+        print(
+            f"{row['variant']:<14}{row['encode_ms']:>11.2f}"
+            f"{baseline['encode_ms'] / row['encode_ms']:>8.1f}x"
+            f"{row['compress_ms']:>13.2f}{row['bytes']:>12}"
+            f"{baseline['bytes'] / row['bytes']:>8.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=1000, help="test cases")
+    parser.add_argument("--message-words", type=int, default=60)
+    parser.add_argument("--output-words", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    rows = run(args)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
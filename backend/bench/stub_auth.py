@@ -0,0 +1,32 @@
+"""
+Drop-in replacement for `utils.firebase` used by the load test and the tests.
+
+Every bearer token is accepted and used as the Firebase uid, so each distinct
+token is a distinct user. Install it with `install()` before importing the app.
+Never use this outside benchmarks and tests.
+"""
+
+import sys
+import time
+import types
+
+
+class StubFirebaseUser:
+    def __init__(self, uid: str):
+        self.uid = uid
+        self.email = f"{uid}@bench.local"
+
+
+async def decode_firebase_token(token: str) -> dict:
+    return {"uid": token, "exp": time.time() + 3600}
+
+
+async def get_firebase_user(uid: str) -> StubFirebaseUser:
+    return StubFirebaseUser(uid)
+
+
+def install() -> None:
+    module = types.ModuleType("utils.firebase")
+    module.decode_firebase_token = decode_firebase_token
+    module.get_firebase_user = get_firebase_user
+    sys.modules["utils.firebase"] = module
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.completion_cache import CompletionCacheEntry
+
+
+async def get_completion(db: AsyncSession, key: str, ttl: Optional[float] = None):
+    query = select(CompletionCacheEntry).where(CompletionCacheEntry.key == key)
+    if ttl is not None:
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        query = query.where(CompletionCacheEntry.created_at >= cutoff)
+    return await db.scalar(query)
+
+
+async def set_completion(db: AsyncSession, key: str, output: str) -> None:
+    await db.merge(
+        CompletionCacheEntry(key=key, output=output, created_at=datetime.utcnow())
+    )
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another worker stored the same completion concurrently
+        await db.rollback()
@@ -1,51 +1,125 @@
-from sqlalchemy.orm import Session
-from models import Prompt
+from datetime import datetime
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Prompt, RunLog, TestCase, Version
 from schemas.prompt import PromptCreate
-from typing import Optional
+from typing import List, Optional, Tuple
 
 
-def get_prompts(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return (
-        db.query(Prompt)
-        .filter(Prompt.user_id == user_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+async def get_prompts(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> List[Prompt]:
+    """
+    Get a user's prompts, newest first, starting after the (created_at, id)
+    keyset cursor `after`.
+    """
+    query = select(Prompt).where(Prompt.user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(Prompt.created_at, Prompt.id) < tuple_(*after))
+    query = query.order_by(Prompt.created_at.desc(), Prompt.id.desc()).limit(limit)
+    return (await db.scalars(query)).all()
+
+
+async def get_prompt_summaries(db: AsyncSession, user_id: int) -> List[Row]:
+    """
+    Get all of a user's prompts, newest first, each with its test case count,
+    latest version number and the time of its last run log, in one query.
+
+    The aggregates are correlated subqueries, so each one is answered from the
+    (prompt_id, ...) index of its table instead of scanning it.
+    """
+    test_case_count = (
+        select(func.count(TestCase.id))
+        .where(TestCase.prompt_id == Prompt.id)
+        .scalar_subquery()
+    )
+    latest_version = (
+        select(func.max(Version.number))
+        .where(Version.prompt_id == Prompt.id)
+        .scalar_subquery()
+    )
+    last_run_at = (
+        select(func.max(RunLog.created_at))
+        .where(RunLog.prompt_id == Prompt.id)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Prompt.id,
+            Prompt.name,
+            Prompt.user_id,
+            Prompt.created_at,
+            test_case_count.label("test_case_count"),
+            latest_version.label("latest_version"),
+            last_run_at.label("last_run_at"),
+        )
+        .where(Prompt.user_id == user_id)
+        .order_by(Prompt.created_at.desc(), Prompt.id.desc())
     )
+    return (await db.execute(query)).all()
+
+
+async def get_prompt(
+    db: AsyncSession, prompt_id: int, user_id: int
+) -> Optional[Prompt]:
+    return await db.scalar(
+        select(Prompt).where(Prompt.id == prompt_id, Prompt.user_id == user_id)
+    )
+
+
+async def get_prompt_revision(
+    db: AsyncSession, prompt_id: int, user_id: Optional[int] = None
+) -> Optional[int]:
+    """
+    Get a prompt's revision; with `user_id`, only if that user owns it.
+    """
+    query = select(Prompt.revision).where(Prompt.id == prompt_id)
+    if user_id is not None:
+        query = query.where(Prompt.user_id == user_id)
+    return await db.scalar(query)
 
 
-def get_prompt(db: Session, prompt_id: int, user_id: int) -> Optional[Prompt]:
-    return (
-        db.query(Prompt)
-        .filter(Prompt.id == prompt_id, Prompt.user_id == user_id)
-        .first()
+async def bump_revision(db: AsyncSession, prompt_id: int) -> None:
+    """
+    Mark a prompt's reads as changed, without committing. Call it in the
+    transaction that changes the prompt, its test cases or its versions.
+    """
+    await db.execute(
+        update(Prompt)
+        .where(Prompt.id == prompt_id)
+        .values(revision=Prompt.revision + 1)
     )
 
 
-def create_prompt(db: Session, name: str, user_id: int) -> Prompt:
+async def create_prompt(db: AsyncSession, name: str, user_id: int) -> Prompt:
     db_prompt = Prompt(name=name, user_id=user_id)
     db.add(db_prompt)
-    db.commit()
-    db.refresh(db_prompt)
+    await db.commit()
+    await db.refresh(db_prompt)
     return db_prompt
 
 
-def delete_prompt(db: Session, prompt_id: int, user_id: int) -> bool:
-    prompt = get_prompt(db, prompt_id, user_id)
+async def delete_prompt(db: AsyncSession, prompt_id: int, user_id: int) -> bool:
+    prompt = await get_prompt(db, prompt_id, user_id)
     if prompt:
-        db.delete(prompt)
-        db.commit()
+        await db.delete(prompt)
+        await db.commit()
         return True
     return False
 
 
-def rename_prompt(
-    db: Session, prompt_id: int, user_id: int, new_name: str
+async def rename_prompt(
+    db: AsyncSession, prompt_id: int, user_id: int, new_name: str
 ) -> Optional[Prompt]:
-    prompt = get_prompt(db, prompt_id, user_id)
+    prompt = await get_prompt(db, prompt_id, user_id)
     if prompt:
         prompt.name = new_name
-        db.commit()
-        db.refresh(prompt)
+        await bump_revision(db, prompt_id)
+        await db.commit()
+        await db.refresh(prompt)
         return prompt
     return None
@@ -0,0 +1,302 @@
+from datetime import datetime
+from typing import List, Optional, Set
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    distinct,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from models.run import (
+    Run,
+    RUN_QUEUED,
+    RUN_RUNNING,
+    RUN_COMPLETED,
+    RUN_FAILED,
+    RUN_MODE_JOB,
+    RUN_MODE_BATCH,
+)
+from models.run_log import RunLog
+from models.run_test_case import RunTestCaseLink
+from models.test_case import TestCase
+from crud.system_prompt import get_or_create_system_prompt
+
+# Ids bound per statement, well under the database's parameter limit
+ID_CHUNK_SIZE = 1000
+
+
+async def create_run(
+    db: AsyncSession,
+    user_id: int,
+    prompt_id: int,
+    system_prompt: str,
+    mode: str,
+    total: int,
+    status: str = RUN_QUEUED,
+    max_concurrency: Optional[int] = None,
+    bypass_cache: bool = False,
+    version_id: Optional[int] = None,
+    sample_fraction: Optional[float] = None,
+    sample_seed: Optional[int] = None,
+    sample_changed_first: bool = False,
+    temperature: float = 0.7,
+    top_p: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    seed: Optional[int] = None,
+    samples_per_case: int = 1,
+    test_case_ids: Optional[List[int]] = None,
+) -> Run:
+    """
+    Create a run; `test_case_ids` records the test cases a sample run
+    selected.
+    """
+    now = datetime.utcnow()
+    db_system_prompt = await get_or_create_system_prompt(db, system_prompt)
+    db_run = Run(
+        user_id=user_id,
+        prompt_id=prompt_id,
+        version_id=version_id,
+        system_prompt_id=db_system_prompt.id,
+        mode=mode,
+        status=status,
+        total=total,
+        max_concurrency=max_concurrency,
+        bypass_cache=bypass_cache,
+        sample_fraction=sample_fraction,
+        sample_seed=sample_seed,
+        sample_changed_first=sample_changed_first,
+        temperature=temperature,
+        top_p=top_p,
+        max_tokens=max_tokens,
+        seed=seed,
+        samples_per_case=samples_per_case,
+        created_at=now,
+        started_at=now if status == RUN_RUNNING else None,
+    )
+    db.add(db_run)
+    await db.flush()
+    if test_case_ids:
+        await db.execute(
+            insert(RunTestCaseLink),
+            [
+                {"run_id": db_run.id, "test_case_id": test_case_id}
+                for test_case_id in test_case_ids
+            ],
+        )
+    await db.commit()
+    await db.refresh(db_run)
+    return db_run
+
+
+async def get_run_test_cases(
+    db: AsyncSession, run_id: int, submitted: bool = False
+) -> List[TestCase]:
+    """
+    The test cases recorded for a run (only those sent in its batch with
+    `submitted`), in id order.
+    """
+    query = (
+        select(TestCase)
+        .join(RunTestCaseLink, RunTestCaseLink.test_case_id == TestCase.id)
+        .where(RunTestCaseLink.run_id == run_id)
+        .order_by(TestCase.id)
+    )
+    if submitted:
+        query = query.where(RunTestCaseLink.submitted)
+    return (await db.scalars(query)).all()
+
+
+async def get_run(db: AsyncSession, run_id: int, user_id: int) -> Optional[Run]:
+    return await db.scalar(select(Run).where(Run.id == run_id, Run.user_id == user_id))
+
+
+async def claim_next_run(db: AsyncSession, mode: str = RUN_MODE_JOB) -> Optional[Run]:
+    """
+    Atomically move the oldest queued run of `mode` to running and return it
+    with its system prompt loaded. Concurrent workers skip rows already locked
+    by another claim.
+    """
+    while True:
+        run_id = await db.scalar(
+            select(Run.id)
+            .where(Run.status == RUN_QUEUED, Run.mode == mode)
+            .order_by(Run.id)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+        )
+        if run_id is None:
+            return None
+        # Compare-and-set so databases without SKIP LOCKED can't double-claim
+        result = await db.execute(
+            update(Run)
+            .where(Run.id == run_id, Run.status == RUN_QUEUED)
+            .values(status=RUN_RUNNING, started_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount:
+            return await db.scalar(
+                select(Run)
+                .options(joinedload(Run.system_prompt))
+                .where(Run.id == run_id)
+            )
+
+
+async def requeue_interrupted_runs(db: AsyncSession) -> int:
+    """
+    Put job runs left running by a previous process back on the queue, along
+    with batch runs it was still submitting.
+    """
+    result = await db.execute(
+        update(Run)
+        .where(
+            Run.status == RUN_RUNNING,
+            or_(
+                Run.mode == RUN_MODE_JOB,
+                and_(Run.mode == RUN_MODE_BATCH, Run.batch_id.is_(None)),
+            ),
+        )
+        .values(status=RUN_QUEUED)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def set_run_batch(
+    db: AsyncSession, run_id: int, batch_id: str, test_case_ids: List[int]
+) -> None:
+    """
+    Record the submitted batch of a run and the test cases requested in it.
+    """
+    for start in range(0, len(test_case_ids), ID_CHUNK_SIZE):
+        # Replaces the rows of a sample run's selection
+        await db.execute(
+            delete(RunTestCaseLink).where(
+                RunTestCaseLink.run_id == run_id,
+                RunTestCaseLink.test_case_id.in_(
+                    test_case_ids[start : start + ID_CHUNK_SIZE]
+                ),
+            )
+        )
+    await db.execute(
+        insert(RunTestCaseLink),
+        [
+            {"run_id": run_id, "test_case_id": test_case_id, "submitted": True}
+            for test_case_id in test_case_ids
+        ],
+    )
+    await db.execute(
+        update(Run)
+        .where(Run.id == run_id)
+        .values(batch_id=batch_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def get_submitted_batch_runs(db: AsyncSession) -> List[Run]:
+    """
+    Batch runs whose batch is submitted and not ingested yet, oldest first.
+    """
+    query = (
+        select(Run)
+        .options(joinedload(Run.system_prompt))
+        .where(
+            Run.status == RUN_RUNNING,
+            Run.mode == RUN_MODE_BATCH,
+            Run.batch_id.is_not(None),
+        )
+        .order_by(Run.id)
+    )
+    return (await db.scalars(query)).all()
+
+
+async def queue_run_completion(db: AsyncSession, run_id: int, total: int) -> bool:
+    """
+    Turn a finished sample run into a full run and queue it again: a batch
+    run for the batch poller, any other as a job. Only the test cases without
+    a run log are executed. Returns False if the run is not a finished sample.
+    """
+    # The full run covers every test case, so the sample's list is dropped
+    await db.execute(delete(RunTestCaseLink).where(RunTestCaseLink.run_id == run_id))
+    result = await db.execute(
+        update(Run)
+        .where(
+            Run.id == run_id,
+            Run.sample_fraction.is_not(None),
+            Run.status.in_((RUN_COMPLETED, RUN_FAILED)),
+        )
+        .values(
+            mode=case((Run.mode == RUN_MODE_BATCH, RUN_MODE_BATCH), else_=RUN_MODE_JOB),
+            status=RUN_QUEUED,
+            total=total,
+            sample_fraction=None,
+            sample_seed=None,
+            sample_changed_first=False,
+            batch_id=None,
+            error=None,
+            finished_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        await db.rollback()
+        return False
+    await db.commit()
+    return True
+
+
+async def finish_run(
+    db: AsyncSession, run_id: int, error: Optional[str] = None
+) -> None:
+    await db.execute(
+        update(Run)
+        .where(Run.id == run_id)
+        .values(
+            status=RUN_FAILED if error else RUN_COMPLETED,
+            error=error,
+            finished_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def get_run_progress(db: AsyncSession, run_id: int) -> tuple[int, int]:
+    """
+    Return (completed, errors) counts of test cases for a run from its run
+    logs; the samples of a test case count once.
+    """
+    test_cases = func.count(distinct(RunLog.test_case_id))
+    result = await db.execute(
+        select(test_cases, test_cases.filter(RunLog.error)).where(
+            RunLog.run_id == run_id
+        )
+    )
+    completed, errors = result.one()
+    return completed, errors
+
+
+async def get_completed_test_case_ids(db: AsyncSession, run_id: int) -> Set[int]:
+    rows = await db.scalars(
+        select(RunLog.test_case_id).where(
+            RunLog.run_id == run_id, RunLog.test_case_id.isnot(None)
+        )
+    )
+    return set(rows)
+
+
+async def get_run_results(db: AsyncSession, run_id: int) -> List[RunLog]:
+    query = (
+        select(RunLog)
+        .where(RunLog.run_id == run_id)
+        .order_by(RunLog.test_case_id, RunLog.sample_index)
+    )
+    return (await db.scalars(query)).all()
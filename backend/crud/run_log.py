@@ -1,16 +1,219 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Float,
+    Integer,
+    and_,
+    case,
+    cast,
+    func,
+    insert,
+    not_,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.run_log import RunLogCreate
 from models.run_log import RunLog
-from typing import Optional
+from models.run import Run
+from models.version import Version
+from crud.system_prompt import get_or_create_system_prompt, get_system_prompt_ids
+from typing import Dict, List, Optional
 
 
-def create_run_log(db: Session, run_log: RunLogCreate):
+async def create_run_log(db: AsyncSession, run_log: RunLogCreate):
+    system_prompt = await get_or_create_system_prompt(db, run_log.system_prompt)
     db_run_log = RunLog(
         user_id=run_log.user_id,
         prompt_id=run_log.prompt_id,
-        system_prompt=run_log.system_prompt,
+        system_prompt_id=system_prompt.id,
         user_message=run_log.user_message,
         response=run_log.response,
     )
     db.add(db_run_log)
-    db.commit()
+    await db.commit()
+
+
+async def create_run_logs(db: AsyncSession, run_logs: List[RunLogCreate]) -> None:
+    """
+    Insert many run logs with a single multi-row INSERT and one commit.
+    """
+    if not run_logs:
+        return
+    system_prompt_ids = await get_system_prompt_ids(
+        db, (run_log.system_prompt for run_log in run_logs)
+    )
+    rows = []
+    for run_log in run_logs:
+        row = run_log.model_dump(exclude={"system_prompt"})
+        row["system_prompt_id"] = system_prompt_ids[run_log.system_prompt]
+        rows.append(row)
+    await db.execute(insert(RunLog), rows)
+    await db.commit()
+
+
+def _latency_percentiles(prompt_id: int, model_call, fractions: List[float]):
+    """
+    Subquery of the latency percentiles of each version of a prompt for
+    databases without percentile_cont (SQLite). Each is interpolated between
+    the two closest ranks, as percentile_cont does.
+    """
+    ranked = (
+        select(
+            Run.version_id,
+            RunLog.latency_ms,
+            func.row_number()
+            .over(partition_by=Run.version_id, order_by=RunLog.latency_ms)
+            .label("rank"),
+            func.count().over(partition_by=Run.version_id).label("count"),
+        )
+        .join(Run, Run.id == RunLog.run_id)
+        .join(Version, Version.id == Run.version_id)
+        .where(
+            Version.prompt_id == prompt_id,
+            model_call,
+            RunLog.latency_ms.is_not(None),
+        )
+        .subquery()
+    )
+    columns = []
+    for fraction in fractions:
+        position = 1 + fraction * (ranked.c.count - 1)
+        lower = cast(position, Integer)
+        weight = position - lower
+        columns.append(
+            func.sum(
+                case(
+                    (ranked.c.rank == lower, ranked.c.latency_ms * (1 - weight)),
+                    (ranked.c.rank == lower + 1, ranked.c.latency_ms * weight),
+                    else_=0,
+                )
+            )
+        )
+    return (
+        select(ranked.c.version_id, *columns).group_by(ranked.c.version_id).subquery()
+    )
+
+
+async def get_version_profiles(db: AsyncSession, prompt_id: int):
+    """
+    Aggregate call latency, token usage and error rate per version of a prompt.
+    Percentiles and averages only cover successful, uncached calls.
+    """
+    model_call = and_(not_(RunLog.error), not_(RunLog.cached))
+    latency = case((model_call, RunLog.latency_ms))
+    calls = func.count(RunLog.id)
+    errors = func.count(RunLog.id).filter(RunLog.error)
+    if db.bind.dialect.name == "postgresql":
+        percentiles = None
+        p50 = func.percentile_cont(0.5).within_group(latency)
+        p95 = func.percentile_cont(0.95).within_group(latency)
+    else:
+        percentiles = _latency_percentiles(prompt_id, model_call, [0.5, 0.95])
+        _, p50, p95 = percentiles.c
+        # One value per version; aggregated only to fit the GROUP BY
+        p50, p95 = func.max(p50), func.max(p95)
+    query = (
+        select(
+            Version.id.label("version_id"),
+            Version.number.label("version_number"),
+            calls.label("calls"),
+            errors.label("errors"),
+            (cast(errors, Float) / func.nullif(calls, 0)).label("error_rate"),
+            p50.label("p50_latency_ms"),
+            p95.label("p95_latency_ms"),
+            func.avg(case((model_call, RunLog.prompt_tokens))).label(
+                "avg_prompt_tokens"
+            ),
+            func.avg(case((model_call, RunLog.completion_tokens))).label(
+                "avg_completion_tokens"
+            ),
+            func.avg(
+                case((model_call, RunLog.prompt_tokens + RunLog.completion_tokens))
+            ).label("avg_total_tokens"),
+        )
+        .join(Run, Run.version_id == Version.id)
+        .join(RunLog, RunLog.run_id == Run.id)
+        .where(Version.prompt_id == prompt_id)
+        .group_by(Version.id, Version.number)
+        .order_by(Version.number.desc())
+    )
+    if percentiles is not None:
+        query = query.outerjoin(percentiles, percentiles.c.version_id == Version.id)
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_latest_version_run_logs(db: AsyncSession, version_id: int):
+    """
+    The (test_case_id, id, run_id) of the latest run log of each test case
+    across a version's runs, without loading any text.
+    """
+    ranked = (
+        select(
+            RunLog.test_case_id,
+            RunLog.id,
+            RunLog.run_id,
+            func.row_number()
+            .over(
+                partition_by=RunLog.test_case_id,
+                order_by=(RunLog.created_at.desc(), RunLog.id.desc()),
+            )
+            .label("rank"),
+        )
+        .join(Run, Run.id == RunLog.run_id)
+        .where(Run.version_id == version_id, RunLog.test_case_id.is_not(None))
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranked.c.test_case_id, ranked.c.id, ranked.c.run_id)
+        .where(ranked.c.rank == 1)
+        .order_by(ranked.c.test_case_id)
+    )
+    return result.all()
+
+
+async def get_run_log_outputs(db: AsyncSession, run_log_ids: List[int]) -> Dict:
+    """
+    Map run log ids to their (user_message, response, error).
+    """
+    result = await db.execute(
+        select(RunLog.id, RunLog.user_message, RunLog.response, RunLog.error).where(
+            RunLog.id.in_(run_log_ids)
+        )
+    )
+    return {row.id: row for row in result}
+
+
+async def get_changed_test_case_ids(db: AsyncSession, prompt_id: int) -> List[int]:
+    """
+    Test cases of a prompt whose latest successful output differs from the one
+    before it, most recently changed first.
+    """
+    newest_first = (RunLog.created_at.desc(), RunLog.id.desc())
+    ranked = (
+        select(
+            RunLog.test_case_id,
+            RunLog.created_at,
+            RunLog.response,
+            func.lead(RunLog.response)
+            .over(partition_by=RunLog.test_case_id, order_by=newest_first)
+            .label("previous_response"),
+            func.row_number()
+            .over(partition_by=RunLog.test_case_id, order_by=newest_first)
+            .label("rank"),
+        )
+        .where(
+            RunLog.prompt_id == prompt_id,
+            RunLog.test_case_id.is_not(None),
+            not_(RunLog.error),
+        )
+        .subquery()
+    )
+    rows = await db.scalars(
+        select(ranked.c.test_case_id)
+        .where(
+            ranked.c.rank == 1,
+            ranked.c.previous_response.is_not(None),
+            ranked.c.response != ranked.c.previous_response,
+        )
+        .order_by(ranked.c.created_at.desc())
+    )
+    return rows.all()
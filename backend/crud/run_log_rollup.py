@@ -0,0 +1,67 @@
+from datetime import date, datetime, time
+from typing import List
+from sqlalchemy import and_, case, func, not_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.run_log import RunLog
+from models.run_log_rollup import RunLogDailyRollup
+
+ROLLUP_COLUMNS = (
+    "calls",
+    "errors",
+    "cache_hits",
+    "model_calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "latency_ms",
+)
+
+
+async def rollup_run_logs(db: AsyncSession, start: date, end: date) -> None:
+    """
+    Recompute the daily rollups of every prompt for the days in [start, end)
+    from the run logs still stored. Days are replaced as a whole, so running
+    it again over the same range is safe.
+    """
+    model_call = and_(not_(RunLog.error), not_(RunLog.cached))
+    day = func.date(RunLog.created_at)
+    query = (
+        select(
+            day,
+            RunLog.prompt_id,
+            func.count(RunLog.id),
+            func.count(RunLog.id).filter(RunLog.error),
+            func.count(RunLog.id).filter(RunLog.cached),
+            func.count(RunLog.id).filter(model_call),
+            func.coalesce(func.sum(case((model_call, RunLog.prompt_tokens))), 0),
+            func.coalesce(func.sum(case((model_call, RunLog.completion_tokens))), 0),
+            func.coalesce(func.sum(case((model_call, RunLog.latency_ms))), 0.0),
+        )
+        .where(
+            RunLog.created_at >= datetime.combine(start, time.min),
+            RunLog.created_at < datetime.combine(end, time.min),
+            RunLog.prompt_id.isnot(None),
+        )
+        .group_by(day, RunLog.prompt_id)
+    )
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(RunLogDailyRollup).from_select(
+        ["day", "prompt_id", *ROLLUP_COLUMNS], query
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "prompt_id"],
+        set_={column: stmt.excluded[column] for column in ROLLUP_COLUMNS},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def get_daily_rollups(
+    db: AsyncSession, prompt_id: int, since: date
+) -> List[RunLogDailyRollup]:
+    query = (
+        select(RunLogDailyRollup)
+        .where(RunLogDailyRollup.prompt_id == prompt_id, RunLogDailyRollup.day >= since)
+        .order_by(RunLogDailyRollup.day)
+    )
+    return (await db.scalars(query)).all()
@@ -0,0 +1,44 @@
+import hashlib
+from typing import Dict, Iterable
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.system_prompt import SystemPrompt
+
+
+def hash_system_prompt(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+async def get_or_create_system_prompt(db: AsyncSession, content: str) -> SystemPrompt:
+    """
+    Return the stored system prompt with this content, creating it if needed.
+    """
+    content_hash = hash_system_prompt(content)
+    query = select(SystemPrompt).where(SystemPrompt.hash == content_hash)
+    system_prompt = await db.scalar(query)
+    if system_prompt:
+        return system_prompt
+
+    system_prompt = SystemPrompt(hash=content_hash, content=content)
+    db.add(system_prompt)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Stored concurrently by another request
+        await db.rollback()
+        return await db.scalar(query)
+    await db.refresh(system_prompt)
+    return system_prompt
+
+
+async def get_system_prompt_ids(
+    db: AsyncSession, contents: Iterable[str]
+) -> Dict[str, int]:
+    """
+    Map each distinct system prompt content to its stored id.
+    """
+    return {
+        content: (await get_or_create_system_prompt(db, content)).id
+        for content in set(contents)
+    }
@@ -1,45 +1,108 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud.prompt import bump_revision
 from models.test_case import TestCase
 from schemas.test_case import TestCaseCreate, TestCaseUpdate
+from typing import AsyncIterator, List, Optional, Sequence
 
 
-def create_test_case(
-    db: Session, test_case: TestCaseCreate, prompt_id: int
+async def create_test_case(
+    db: AsyncSession, test_case: TestCaseCreate, prompt_id: int
 ) -> TestCase:
     db_test_case = TestCase(
         user_message=test_case.user_message,
         prompt_id=prompt_id,
     )
     db.add(db_test_case)
-    db.commit()
-    db.refresh(db_test_case)
+    await bump_revision(db, prompt_id)
+    await db.commit()
+    await db.refresh(db_test_case)
     return db_test_case
 
 
-def get_test_case(db: Session, test_case_id: int) -> TestCase:
-    return db.query(TestCase).filter(TestCase.id == test_case_id).first()
+async def add_test_cases(
+    db: AsyncSession, prompt_id: int, user_messages: List[str]
+) -> None:
+    """
+    Insert test cases with one multi-row INSERT, without committing. The
+    caller bumps the prompt's revision.
+    """
+    await db.execute(
+        insert(TestCase),
+        [
+            {"prompt_id": prompt_id, "user_message": message}
+            for message in user_messages
+        ],
+    )
+
+
+async def get_test_case(db: AsyncSession, test_case_id: int) -> TestCase:
+    return await db.scalar(select(TestCase).where(TestCase.id == test_case_id))
+
+
+async def get_test_cases_by_prompt(db: AsyncSession, prompt_id: int) -> list[TestCase]:
+    query = (
+        select(TestCase).where(TestCase.prompt_id == prompt_id).order_by(TestCase.id)
+    )
+    return (await db.scalars(query)).all()
 
 
-def get_test_cases_by_prompt(db: Session, prompt_id: int) -> list[TestCase]:
-    return db.query(TestCase).filter(TestCase.prompt_id == prompt_id).all()
+async def count_test_cases(db: AsyncSession, prompt_id: int) -> int:
+    return await db.scalar(
+        select(func.count(TestCase.id)).where(TestCase.prompt_id == prompt_id)
+    )
+
+
+async def get_test_cases_page(
+    db: AsyncSession,
+    prompt_id: int,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+) -> list[TestCase]:
+    """
+    Get a prompt's test cases in id order, starting after `after_id`.
+    """
+    query = select(TestCase).where(TestCase.prompt_id == prompt_id)
+    if after_id is not None:
+        query = query.where(TestCase.id > after_id)
+    return (await db.scalars(query.order_by(TestCase.id).limit(limit))).all()
 
 
-def update_test_case(
-    db: Session, test_case_id: int, test_case: TestCaseUpdate
+async def update_test_case(
+    db: AsyncSession, test_case_id: int, test_case: TestCaseUpdate
 ) -> TestCase:
-    db_test_case = db.query(TestCase).filter(TestCase.id == test_case_id).first()
+    db_test_case = await get_test_case(db, test_case_id)
     if db_test_case:
         for key, value in test_case.dict(exclude_unset=True).items():
             setattr(db_test_case, key, value)
-        db.commit()
-        db.refresh(db_test_case)
+        await bump_revision(db, db_test_case.prompt_id)
+        await db.commit()
+        await db.refresh(db_test_case)
     return db_test_case
 
 
-def delete_test_case(db: Session, test_case_id: int) -> bool:
-    db_test_case = db.query(TestCase).filter(TestCase.id == test_case_id).first()
+async def delete_test_case(db: AsyncSession, test_case_id: int) -> bool:
+    db_test_case = await get_test_case(db, test_case_id)
     if db_test_case:
-        db.delete(db_test_case)
-        db.commit()
+        await db.delete(db_test_case)
+        await bump_revision(db, db_test_case.prompt_id)
+        await db.commit()
         return True
     return False
+
+
+async def stream_test_cases(
+    db: AsyncSession, prompt_id: int, chunk_size: int = 500
+) -> AsyncIterator[Sequence[tuple]]:
+    """
+    Yield a prompt's (id, user_message) rows in id order, `chunk_size` at a
+    time, from a server-side cursor.
+    """
+    result = await db.stream(
+        select(TestCase.id, TestCase.user_message)
+        .where(TestCase.prompt_id == prompt_id)
+        .order_by(TestCase.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    async for rows in result.partitions():
+        yield rows
@@ -1,25 +1,32 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
 from schemas.user import UserCreate
+from typing import Optional
 
 
-def get_user(db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(User).where(User.id == user_id))
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
 
 
-def get_user_by_firebase_uid(db: Session, firebase_uid: str):
-    return db.query(User).filter(User.firebase_uid == firebase_uid).first()
+async def get_user_by_firebase_uid(db: AsyncSession, firebase_uid: str):
+    return await db.scalar(select(User).where(User.firebase_uid == firebase_uid))
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(User).offset(skip).limit(limit).all()
+async def get_users(db: AsyncSession, limit: int = 100, after_id: Optional[int] = None):
+    query = select(User)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    return (await db.scalars(query.order_by(User.id).limit(limit))).all()
 
 
-def create_user_from_firebase(db: Session, user: UserCreate, firebase_uid: str):
+async def create_user_from_firebase(
+    db: AsyncSession, user: UserCreate, firebase_uid: str
+):
     """
     Create a new user from Firebase authentication.
     """
@@ -28,6 +35,6 @@ def create_user_from_firebase(db: Session, user: UserCreate, firebase_uid: str):
         firebase_uid=firebase_uid,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
@@ -1,54 +1,84 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud.prompt import bump_revision
 from models.version import Version
+from models.prompt import Prompt
 from schemas.version import VersionCreate
 from typing import List, Optional
 
 
-def create_version(db: Session, version: VersionCreate) -> Version:
-    # Get the latest version number for this prompt
-    latest_version = (
-        db.query(Version)
-        .filter(Version.prompt_id == version.prompt_id)
-        .order_by(Version.number.desc())
-        .first()
-    )
+async def create_version(
+    db: AsyncSession, version: VersionCreate, max_attempts: int = 5
+) -> Version:
+    for attempt in range(max_attempts):
+        # Get the latest version number for this prompt
+        latest_version = await get_current_version(db, prompt_id=version.prompt_id)
 
-    # Calculate the new version number
-    new_version_number = 1 if latest_version is None else latest_version.number + 1
+        # Calculate the new version number
+        new_version_number = 1 if latest_version is None else latest_version.number + 1
 
-    # Create the new version
-    db_version = Version(
-        number=new_version_number,
-        system_prompt=version.system_prompt,
-        prompt_id=version.prompt_id,
-    )
-    db.add(db_version)
-    db.commit()
-    db.refresh(db_version)
-    return db_version
+        # Create the new version
+        db_version = Version(
+            number=new_version_number,
+            system_prompt=version.system_prompt,
+            prompt_id=version.prompt_id,
+        )
+        db.add(db_version)
+        await bump_revision(db, version.prompt_id)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request took this number (or the prompt is gone)
+            await db.rollback()
+            if attempt == max_attempts - 1:
+                raise
+            continue
+        await db.refresh(db_version)
+        return db_version
 
 
-def get_versions_by_prompt(db: Session, prompt_id: int) -> List[Version]:
-    return (
-        db.query(Version)
-        .filter(Version.prompt_id == prompt_id)
-        .order_by(Version.number.desc())
-        .all()
-    )
+async def get_versions_by_prompt(
+    db: AsyncSession,
+    prompt_id: int,
+    limit: int = 100,
+    before_number: Optional[int] = None,
+) -> List[Version]:
+    """
+    Get a prompt's versions, newest first, starting below `before_number`.
+    """
+    query = select(Version).where(Version.prompt_id == prompt_id)
+    if before_number is not None:
+        query = query.where(Version.number < before_number)
+    return (await db.scalars(query.order_by(Version.number.desc()).limit(limit))).all()
 
 
-def get_version(db: Session, version_id: int) -> Version:
-    return db.query(Version).filter(Version.id == version_id).first()
+async def get_version(db: AsyncSession, version_id: int) -> Version:
+    return await db.scalar(select(Version).where(Version.id == version_id))
 
 
-def get_current_version(db: Session, prompt_id: int) -> Optional[Version]:
+async def get_current_version(db: AsyncSession, prompt_id: int) -> Optional[Version]:
     """
     Get the current (latest) version of a prompt.
     Returns None if no versions exist for the prompt.
     """
-    return (
-        db.query(Version)
-        .filter(Version.prompt_id == prompt_id)
+    return await db.scalar(
+        select(Version)
+        .where(Version.prompt_id == prompt_id)
         .order_by(Version.number.desc())
-        .first()
+        .limit(1)
+    )
+
+
+async def get_user_versions(
+    db: AsyncSession, version_ids: List[int], user_id: int
+) -> List[Version]:
+    """
+    Get the given versions, limited to prompts owned by the user.
+    """
+    query = (
+        select(Version)
+        .join(Prompt, Prompt.id == Version.prompt_id)
+        .where(Version.id.in_(version_ids), Prompt.user_id == user_id)
     )
+    return (await db.scalars(query)).all()
@@ -1,23 +1,77 @@
-from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica for read-only requests; defaults to the primary
+SQLALCHEMY_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Connection pool settings, per engine and per process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Replace connections older than this many seconds (-1 disables)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Async drivers used by the app; Alembic keeps using the sync URL as given
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str):
+    """
+    Swap the driver of a sync database URL for its asyncio counterpart, e.g.
+    `postgresql://...` -> `postgresql+asyncpg://...`.
+    """
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or url.get_dialect().is_async:
+        return url
+    return url.set(drivername=driver)
+
+
+def create_engine(url: str):
+    url = async_database_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.get_backend_name() != "sqlite":
+        # SQLite uses a single-connection or per-thread pool without sizing
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return create_async_engine(url, **options)
+
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+read_engine = (
+    create_engine(SQLALCHEMY_REPLICA_URL) if SQLALCHEMY_REPLICA_URL else engine
+)
+# Objects stay usable after commit; attributes can't be lazily reloaded in async
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+
+# Dependency for read-only requests, served by the replica when configured.
+# Replicas may lag slightly behind, so don't use it to read back fresh writes.
+async def get_read_db():
+    async with ReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,16 +1,35 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routers import users, prompts, test_cases, versions, run
-from database import engine, Base
+from database import engine, read_engine, Base
+from utils.batch import batch_poller
+from utils.compression import CompressionMiddleware
+from utils.diff import shutdown_diff_pool
+from utils.jobs import run_worker_pool
+from utils.run_log_retention import run_log_maintenance
+from utils.metrics import (
+    MetricsMiddleware,
+    TimedJSONResponse,
+    instrument_engine,
+    registry,
+)
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+instrument_engine(engine.sync_engine)
+if read_engine is not engine:
+    instrument_engine(read_engine.sync_engine)
+
+app = FastAPI(default_response_class=TimedJSONResponse)
+
+# Compress responses the client accepts as brotli or gzip
+app.add_middleware(CompressionMiddleware)
 
-app = FastAPI()
+# Record per-route latency and per-stage timings for /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -29,6 +48,47 @@ app.include_router(versions.router, prefix="/versions", tags=["versions"])
 app.include_router(run.router, prefix="/run", tags=["run"])
 
 
+@app.on_event("startup")
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@app.on_event("startup")
+async def start_run_workers():
+    await run_worker_pool.start()
+
+
+@app.on_event("startup")
+async def start_run_log_maintenance():
+    await run_log_maintenance.start()
+
+
+@app.on_event("startup")
+async def start_batch_poller():
+    await batch_poller.start()
+
+
+@app.on_event("shutdown")
+async def stop_run_workers():
+    await run_worker_pool.stop()
+
+
+@app.on_event("shutdown")
+async def stop_run_log_maintenance():
+    await run_log_maintenance.stop()
+
+
+@app.on_event("shutdown")
+async def stop_batch_poller():
+    await batch_poller.stop()
+
+
+@app.on_event("shutdown")
+async def stop_diff_workers():
+    shutdown_diff_pool()
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Prompt Profiler API"}
@@ -37,3 +97,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
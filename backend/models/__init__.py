@@ -3,6 +3,23 @@ from .prompt import Prompt
 from .test_case import TestCase
 from .version import Version
 from database import Base
+from .system_prompt import SystemPrompt
+from .run import Run
 from .run_log import RunLog
+from .run_test_case import RunTestCaseLink
+from .run_log_rollup import RunLogDailyRollup
+from .completion_cache import CompletionCacheEntry
 
-__all__ = ["User", "Prompt", "TestCase", "Version", "Base", "RunLog"]
+__all__ = [
+    "User",
+    "Prompt",
+    "TestCase",
+    "Version",
+    "Base",
+    "SystemPrompt",
+    "Run",
+    "RunLog",
+    "RunTestCaseLink",
+    "RunLogDailyRollup",
+    "CompletionCacheEntry",
+]
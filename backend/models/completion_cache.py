@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime, Text
+from database import Base
+from datetime import datetime
+
+
+class CompletionCacheEntry(Base):
+    __tablename__ = "completion_cache"
+
+    key = Column(String(64), primary_key=True)
+    output = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Index, Integer, String, ForeignKey, DateTime, Text
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -6,11 +6,15 @@ from datetime import datetime
 
 class Prompt(Base):
     __tablename__ = "prompts"
+    __table_args__ = (Index("ix_prompts_user_id_created_at", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped whenever the prompt, its test cases or its versions change; used
+    # as the ETag of those reads
+    revision = Column(Integer, nullable=False, default=0)
 
     owner = relationship("User", back_populates="prompts")
     test_cases = relationship(
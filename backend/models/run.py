@@ -0,0 +1,58 @@
+from sqlalchemy import Boolean, Column, Float, Integer, String, ForeignKey, DateTime
+from sqlalchemy.orm import relationship
+from database import Base
+from datetime import datetime
+
+RUN_QUEUED = "queued"
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+
+RUN_MODE_SYNC = "sync"
+RUN_MODE_STREAM = "stream"
+RUN_MODE_JOB = "job"
+RUN_MODE_BATCH = "batch"
+
+
+class Run(Base):
+    """
+    One execution of a system prompt against a prompt's test cases. Job runs
+    double as the persistent queue consumed by the run worker pool, batch runs
+    as the one consumed by the batch poller.
+    """
+
+    __tablename__ = "runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    prompt_id = Column(
+        Integer, ForeignKey("prompts.id", ondelete="SET NULL"), nullable=True
+    )
+    version_id = Column(
+        Integer, ForeignKey("versions.id", ondelete="SET NULL"), nullable=True
+    )
+    system_prompt_id = Column(Integer, ForeignKey("system_prompts.id"), nullable=False)
+    mode = Column(String, nullable=False, default=RUN_MODE_SYNC)
+    status = Column(String, nullable=False, default=RUN_QUEUED, index=True)
+    total = Column(Integer, nullable=False, default=0)
+    max_concurrency = Column(Integer, nullable=True)
+    bypass_cache = Column(Boolean, nullable=False, default=False)
+    # Set while the run only covers a sample of the prompt's test cases
+    sample_fraction = Column(Float, nullable=True)
+    sample_seed = Column(Integer, nullable=True)
+    sample_changed_first = Column(Boolean, nullable=False, default=False)
+    temperature = Column(Float, nullable=False, default=0.7)
+    top_p = Column(Float, nullable=True)
+    max_tokens = Column(Integer, nullable=True)
+    seed = Column(Integer, nullable=True)
+    samples_per_case = Column(Integer, nullable=False, default=1)
+    # Id of the submitted batch of a batch run, in its batch backend
+    batch_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    version = relationship("Version")
+    system_prompt = relationship("SystemPrompt")
+    run_logs = relationship("RunLog", back_populates="run")
@@ -1,21 +1,57 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Float,
+    Index,
+    Integer,
+    String,
+    ForeignKey,
+    DateTime,
+)
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
 
 
 class RunLog(Base):
+    """
+    One executed test case. On Postgres the table is range-partitioned by
+    month on `created_at` (primary key `(id, created_at)`); see
+    `utils/run_log_retention.py`.
+    """
+
     __tablename__ = "run_logs"
+    __table_args__ = (
+        Index("ix_run_logs_prompt_id_created_at", "prompt_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     prompt_id = Column(
         Integer, ForeignKey("prompts.id", ondelete="SET NULL"), nullable=True
     )
-    created_at = Column(DateTime, default=datetime.utcnow)
-    system_prompt = Column(String)
+    run_id = Column(
+        Integer, ForeignKey("runs.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    test_case_id = Column(
+        Integer, ForeignKey("test_cases.id", ondelete="SET NULL"), nullable=True
+    )
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    system_prompt_id = Column(
+        Integer, ForeignKey("system_prompts.id"), nullable=True, index=True
+    )
+    # Position of the output among the samples of the same call
+    sample_index = Column(Integer, nullable=False, default=0)
     user_message = Column(String)
     response = Column(String)
+    error = Column(Boolean, nullable=False, default=False)
+    cached = Column(Boolean, nullable=False, default=False)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    latency_ms = Column(Float, nullable=True)
+    finish_reason = Column(String, nullable=True)
 
     user = relationship("User", back_populates="run_logs")
     prompt = relationship("Prompt", back_populates="run_logs")
+    system_prompt = relationship("SystemPrompt")
+    run = relationship("Run", back_populates="run_logs")
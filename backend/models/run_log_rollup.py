@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer
+from database import Base
+
+
+class RunLogDailyRollup(Base):
+    """
+    Run log aggregates per prompt and UTC day, kept after the underlying run
+    logs are archived. Latency and token totals only cover successful,
+    uncached model calls (`model_calls`).
+    """
+
+    __tablename__ = "run_log_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    prompt_id = Column(
+        Integer, ForeignKey("prompts.id", ondelete="CASCADE"), primary_key=True
+    )
+    calls = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+    model_calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,22 @@
+from sqlalchemy import Boolean, Column, ForeignKey, Integer
+from database import Base
+
+
+class RunTestCaseLink(Base):
+    """
+    A test case selected for a sample run when the run was created, or sent
+    in a batch run's batch. Resuming or completing a run works from this list
+    rather than sampling again, which could pick a different subset once test
+    cases or outputs change, and a batch is ingested against what it was sent.
+    """
+
+    __tablename__ = "run_test_cases"
+
+    run_id = Column(
+        Integer, ForeignKey("runs.id", ondelete="CASCADE"), primary_key=True
+    )
+    test_case_id = Column(
+        Integer, ForeignKey("test_cases.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Requested in the run's submitted batch
+    submitted = Column(Boolean, nullable=False, default=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from database import Base
+from datetime import datetime
+
+
+class SystemPrompt(Base):
+    """
+    A system prompt stored once and referenced by its SHA-256 content hash.
+    """
+
+    __tablename__ = "system_prompts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hash = Column(String(64), unique=True, index=True, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
 from database import Base
 
 
 class TestCase(Base):
     __tablename__ = "test_cases"
+    __table_args__ = (Index("ix_test_cases_prompt_id_id", "prompt_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_message = Column(String, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Index, Integer, String, ForeignKey, DateTime, Text
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -6,6 +6,9 @@ from datetime import datetime
 
 class Version(Base):
     __tablename__ = "versions"
+    __table_args__ = (
+        Index("ix_versions_prompt_id_number", "prompt_id", "number", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     number = Column(Integer, nullable=False)
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from database import get_db
+from database import get_db, get_read_db
 from crud import prompt as prompt_crud
-from schemas.prompt import Prompt as PromptSchema, PromptCreate
-from models.prompt import Prompt
+from schemas.prompt import Prompt as PromptSchema, PromptCreate, PromptSummary
+from schemas.pagination import Page
 from utils.auth import get_current_user
+from utils.etag import user_prompt_etag
+from utils.pagination import PageParams, cursor_key, paginate
 
 router = APIRouter()
 
@@ -17,41 +20,74 @@ class RenamePromptRequest(BaseModel):
 
 
 @router.post("/", response_model=PromptSchema)
-def create_prompt(
+async def create_prompt(
     prompt: PromptCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    return prompt_crud.create_prompt(db=db, name=prompt.name, user_id=current_user.id)
+    return await prompt_crud.create_prompt(
+        db=db, name=prompt.name, user_id=current_user.id
+    )
 
 
-@router.get("/", response_model=List[PromptSchema])
-def get_prompts(
-    db: Session = Depends(get_db),
+@router.get("/", response_model=Page[PromptSchema])
+async def get_prompts(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
-    return db.query(Prompt).filter(Prompt.user_id == current_user.id).all()
+    """
+    List the current user's prompts, newest first. Pass `next_cursor` from the
+    response as `cursor` to fetch the following page.
+    """
+    prompts = await prompt_crud.get_prompts(
+        db,
+        user_id=current_user.id,
+        limit=page.limit + 1,
+        after=cursor_key(page.after, datetime.fromisoformat, int),
+    )
+    return paginate(
+        prompts, page.limit, key=lambda prompt: (prompt.created_at, prompt.id)
+    )
 
 
-@router.get("/{prompt_id}", response_model=PromptSchema)
-def get_prompt(
+@router.get("/summary", response_model=List[PromptSummary])
+async def get_prompt_summaries(
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    All of the current user's prompts, newest first, with their test case
+    count, latest version number and last run time, for the dashboard.
+    """
+    return await prompt_crud.get_prompt_summaries(db, user_id=current_user.id)
+
+
+@router.get(
+    "/{prompt_id}",
+    response_model=PromptSchema,
+    dependencies=[Depends(user_prompt_etag)],
+)
+async def get_prompt(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
-    prompt = prompt_crud.get_prompt(db=db, prompt_id=prompt_id, user_id=current_user.id)
+    prompt = await prompt_crud.get_prompt(
+        db=db, prompt_id=prompt_id, user_id=current_user.id
+    )
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     return prompt
 
 
 @router.delete("/{prompt_id}", response_model=bool)
-def delete_prompt(
+async def delete_prompt(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    success = prompt_crud.delete_prompt(
+    success = await prompt_crud.delete_prompt(
         db=db, prompt_id=prompt_id, user_id=current_user.id
     )
     if not success:
@@ -60,13 +96,13 @@ def delete_prompt(
 
 
 @router.patch("/{prompt_id}/rename", response_model=PromptSchema)
-def rename_prompt(
+async def rename_prompt(
     prompt_id: int,
     request: RenamePromptRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    prompt = prompt_crud.rename_prompt(
+    prompt = await prompt_crud.rename_prompt(
         db=db, prompt_id=prompt_id, user_id=current_user.id, new_name=request.new_name
     )
     if not prompt:
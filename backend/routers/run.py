@@ -1,103 +1,595 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+import json
+import anyio
+from datetime import datetime, timedelta
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_read_db
 from crud import test_case as test_case_crud
-from schemas.run import RunRequest, RunResponse, RunTestCase
+from crud import run as run_crud
+from crud import version as version_crud
+from crud import prompt as prompt_crud
+from crud import run_log as run_log_crud
+from crud import run_log_rollup as rollup_crud
+from models.run import (
+    RUN_MODE_SYNC,
+    RUN_MODE_STREAM,
+    RUN_MODE_JOB,
+    RUN_MODE_BATCH,
+    RUN_RUNNING,
+)
+from models.test_case import TestCase
+from schemas.run import (
+    RunRequest,
+    RunResponse,
+    RunProgress,
+    RunSummary,
+    RunStatus,
+    RunTestCase,
+    MatrixRunRequest,
+    MatrixRunResponse,
+    MatrixRunVersion,
+    VersionProfile,
+    DailyRunStats,
+    TestCaseVariance,
+)
 from utils.auth import get_current_user
+from utils.batch import batch_poller
+from utils.diff import output_variance
+from utils.llm import SamplingParams
+from utils.runner import RunCell, stream_cells, stream_run
+from utils.jobs import run_worker_pool
+from utils.sampling import sample_test_cases
 from models.user import User
-import os
-from openai import AzureOpenAI, OpenAIError
-from dotenv import load_dotenv
-from crud import run_log as run_log_crud
-from schemas.run_log import RunLogCreate
 
+router = APIRouter()
 
-load_dotenv()
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-)
+def _frame(event: str, data: dict, sse: bool) -> str:
+    payload = json.dumps(data)
+    if sse:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"type": event, "data": data}) + "\n"
 
-deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-if not deployment_name:
-    raise RuntimeError("AZURE_OPENAI_DEPLOYMENT_NAME is missing.")
 
-router = APIRouter()
+async def _get_run_test_cases(
+    db: AsyncSession, prompt_id: int, request: RunRequest
+) -> List[TestCase]:
+    if not request.system_prompt:
+        raise HTTPException(status_code=400, detail="System prompt is required")
+
+    test_cases = await test_case_crud.get_test_cases_by_prompt(db, prompt_id)
+
+    if not test_cases:
+        raise HTTPException(
+            status_code=404, detail="No test cases found for this prompt"
+        )
+
+    if request.version_id is not None:
+        version = await version_crud.get_version(db, version_id=request.version_id)
+        if version is None or version.prompt_id != prompt_id:
+            raise HTTPException(
+                status_code=400, detail="Version does not belong to this prompt"
+            )
+
+    if request.sample_fraction is not None:
+        test_cases = await sample_test_cases(
+            db,
+            prompt_id,
+            test_cases,
+            request.sample_fraction,
+            request.sample_seed,
+            changed_first=request.sample_changed_first,
+        )
+    return test_cases
+
+
+def _run_log_results(run_logs) -> List[RunTestCase]:
+    return [
+        RunTestCase(
+            test_case_id=run_log.test_case_id,
+            sample_index=run_log.sample_index,
+            user_message=run_log.user_message,
+            output=run_log.response,
+            error=run_log.error,
+            cached=run_log.cached,
+            prompt_tokens=run_log.prompt_tokens,
+            completion_tokens=run_log.completion_tokens,
+            latency_ms=run_log.latency_ms,
+            finish_reason=run_log.finish_reason,
+        )
+        for run_log in run_logs
+        if run_log.test_case_id is not None
+    ]
+
+
+def _sampling_params(request: RunRequest) -> SamplingParams:
+    return SamplingParams(
+        temperature=request.temperature,
+        top_p=request.top_p,
+        max_tokens=request.max_tokens,
+        seed=request.seed,
+    )
+
+
+def _run_options(request: RunRequest, test_cases: List[TestCase]) -> dict:
+    """
+    The run columns recording which test cases and how many outputs the run
+    samples, and with which parameters.
+    """
+    options = {
+        "temperature": request.temperature,
+        "top_p": request.top_p,
+        "max_tokens": request.max_tokens,
+        "seed": request.seed,
+        "samples_per_case": request.samples_per_case,
+    }
+    if request.sample_fraction is not None:
+        options.update(
+            sample_fraction=request.sample_fraction,
+            sample_seed=request.sample_seed,
+            sample_changed_first=request.sample_changed_first,
+            test_case_ids=[tc.id for tc in test_cases],
+        )
+    return options
 
 
 @router.post("/prompt/{prompt_id}", response_model=RunResponse)
 async def run_prompt(
     prompt_id: int,
     request: RunRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Run the system prompt against all test cases for a given prompt.
+    Test cases are executed concurrently and returned ordered by id.
 
     - **prompt_id**: ID of the prompt to run
     - **system_prompt**: The system prompt to use for running
+    - **max_concurrency**: Optional cap on model calls in flight for this run
+    - **bypass_cache**: Skip cached completions and call the model
+    - **sample_fraction**: Only run a deterministic sample of this fraction of
+      the test cases (seeded by **sample_seed**, optionally filled with the
+      most recently changed outputs first with **sample_changed_first**);
+      `POST /run/jobs/{run_id}/complete` runs the rest later
+    - **temperature**, **top_p**, **max_tokens**, **seed**: Sampling parameters
+    - **samples_per_case**: Outputs per test case, fetched with one call each;
+      the response then reports the variance of each test case's outputs
     """
-    system_prompt = request.system_prompt
-    if not system_prompt:
-        raise HTTPException(status_code=400, detail="System prompt is required")
+    test_cases = await _get_run_test_cases(db, prompt_id, request)
+    run = await run_crud.create_run(
+        db,
+        user_id=current_user.id,
+        prompt_id=prompt_id,
+        system_prompt=request.system_prompt,
+        mode=RUN_MODE_SYNC,
+        status=RUN_RUNNING,
+        total=len(test_cases),
+        max_concurrency=request.max_concurrency,
+        bypass_cache=request.bypass_cache,
+        version_id=request.version_id,
+        **_run_options(request, test_cases),
+    )
 
-    test_cases = test_case_crud.get_test_cases_by_prompt(db, prompt_id)
+    try:
+        results = [
+            result
+            async for result in stream_run(
+                run.id,
+                current_user.id,
+                prompt_id,
+                request.system_prompt,
+                test_cases,
+                max_concurrency=request.max_concurrency,
+                bypass_cache=request.bypass_cache,
+                params=_sampling_params(request),
+                samples=request.samples_per_case,
+            )
+        ]
+    except BaseException as e:
+        await run_crud.finish_run(db, run.id, error=str(e) or type(e).__name__)
+        raise
+    await run_crud.finish_run(db, run.id)
 
-    if not test_cases:
-        raise HTTPException(
-            status_code=404, detail="No test cases found for this prompt"
-        )
+    results.sort(key=lambda result: (result.test_case_id, result.sample_index))
+    cache_hits = sum(result.cached for result in results)
+    return RunResponse(
+        run_id=run.id,
+        results=results,
+        cache_hits=cache_hits,
+        cache_misses=len(results) - cache_hits,
+        variance=(
+            await output_variance(results) if request.samples_per_case > 1 else None
+        ),
+    )
 
-    results = []
 
-    for tc in test_cases:
-        try:
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": tc.user_message},
-                ],
-                temperature=0.7,
-            )
-            output_text = response.choices[0].message.content.strip()
+@router.post("/prompt/{prompt_id}/stream")
+async def stream_prompt(
+    prompt_id: int,
+    request: RunRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Run the system prompt against all test cases for a given prompt, streaming
+    each result as soon as it completes.
 
-            results.append(
-                RunTestCase(
-                    test_case_id=tc.id,
-                    user_message=tc.user_message,
-                    output=output_text,
-                )
-            )
-        except OpenAIError as e:
-            results.append(
-                RunTestCase(
-                    test_case_id=tc.id,
-                    user_message=tc.user_message,
-                    output=f"OpenAI Error: {str(e)}",
+    Frames are emitted as NDJSON (`{"type": ..., "data": ...}` per line), or as
+    Server-Sent Events when the client sends `Accept: text/event-stream`:
+
+    - **result**: a finished test case (`RunTestCase`), one per sample
+    - **progress**: completed / total test case counts after each result
+    - **summary**: totals once every test case has finished
+    """
+    test_cases = await _get_run_test_cases(db, prompt_id, request)
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    total = len(test_cases)
+    run = await run_crud.create_run(
+        db,
+        user_id=current_user.id,
+        prompt_id=prompt_id,
+        system_prompt=request.system_prompt,
+        mode=RUN_MODE_STREAM,
+        status=RUN_RUNNING,
+        total=total,
+        max_concurrency=request.max_concurrency,
+        bypass_cache=request.bypass_cache,
+        version_id=request.version_id,
+        **_run_options(request, test_cases),
+    )
+    run_id = run.id
+
+    async def frames():
+        completed = 0
+        outputs = 0
+        errors = 0
+        cache_hits = 0
+        try:
+            async for result in stream_run(
+                run_id,
+                current_user.id,
+                prompt_id,
+                request.system_prompt,
+                test_cases,
+                max_concurrency=request.max_concurrency,
+                bypass_cache=request.bypass_cache,
+                params=_sampling_params(request),
+                samples=request.samples_per_case,
+            ):
+                # The samples of a test case arrive together, first one first
+                completed += result.sample_index == 0
+                outputs += 1
+                errors += result.error
+                cache_hits += result.cached
+                yield _frame("result", result.model_dump(), sse)
+                yield _frame(
+                    "progress",
+                    RunProgress(completed=completed, total=total).model_dump(),
+                    sse,
                 )
+        except BaseException as e:
+            # Shielded so a client disconnect, which cancels the response,
+            # does not leave the run marked running
+            with anyio.CancelScope(shield=True):
+                await run_crud.finish_run(db, run_id, error=str(e) or type(e).__name__)
+            raise
+        await run_crud.finish_run(db, run_id)
+        yield _frame(
+            "summary",
+            RunSummary(
+                run_id=run_id,
+                total=total,
+                errors=errors,
+                cache_hits=cache_hits,
+                cache_misses=outputs - cache_hits,
+            ).model_dump(),
+            sse,
+        )
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+    )
+
+
+@router.post("/prompt/{prompt_id}/jobs", response_model=RunStatus, status_code=202)
+async def submit_run_job(
+    prompt_id: int,
+    request: RunRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Queue a run of the system prompt against all test cases for a given prompt
+    and return immediately. The run is executed by the background worker pool;
+    poll `GET /run/jobs/{run_id}` for its progress.
+    """
+    test_cases = await _get_run_test_cases(db, prompt_id, request)
+    run = await run_crud.create_run(
+        db,
+        user_id=current_user.id,
+        prompt_id=prompt_id,
+        system_prompt=request.system_prompt,
+        mode=RUN_MODE_JOB,
+        total=len(test_cases),
+        max_concurrency=request.max_concurrency,
+        bypass_cache=request.bypass_cache,
+        version_id=request.version_id,
+        **_run_options(request, test_cases),
+    )
+    run_worker_pool.notify()
+    return run
+
+
+@router.post("/prompt/{prompt_id}/batch", response_model=RunStatus, status_code=202)
+async def submit_batch_run(
+    prompt_id: int,
+    request: RunRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Queue an offline run of the system prompt against all test cases for a
+    given prompt, for large sweeps where throughput and cost matter more than
+    latency. Its requests are submitted as one batch file to the batch
+    backend, outside the deployment's rate limits; results are ingested once
+    the batch finishes, which may take hours. Poll `GET /run/jobs/{run_id}`
+    for its status.
+    """
+    test_cases = await _get_run_test_cases(db, prompt_id, request)
+    run = await run_crud.create_run(
+        db,
+        user_id=current_user.id,
+        prompt_id=prompt_id,
+        system_prompt=request.system_prompt,
+        mode=RUN_MODE_BATCH,
+        total=len(test_cases),
+        bypass_cache=request.bypass_cache,
+        version_id=request.version_id,
+        **_run_options(request, test_cases),
+    )
+    batch_poller.notify()
+    return run
+
+
+@router.post("/jobs/{run_id}/complete", response_model=RunStatus, status_code=202)
+async def complete_sample_run(
+    run_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Extend a finished sample run to all test cases of its prompt, under the
+    same run id. The rest is queued as a job, or as a new batch for a batch
+    run (poll `GET /run/jobs/{run_id}`); test cases the sample already ran are
+    not executed again.
+    """
+    run = await run_crud.get_run(db, run_id=run_id, user_id=current_user.id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.sample_fraction is None:
+        raise HTTPException(status_code=400, detail="Run is not a sample")
+    total = await test_case_crud.count_test_cases(db, run.prompt_id)
+    if not await run_crud.queue_run_completion(db, run_id, total):
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+    await db.refresh(run)
+    if run.mode == RUN_MODE_BATCH:
+        batch_poller.notify()
+    else:
+        run_worker_pool.notify()
+    return run
+
+
+@router.get("/jobs/{run_id}", response_model=RunStatus)
+async def get_run_job(
+    run_id: int,
+    # Read from the primary: clients poll this right after submitting the run
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Return the status and progress counts of a run.
+    """
+    run = await run_crud.get_run(db, run_id=run_id, user_id=current_user.id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    completed, errors = await run_crud.get_run_progress(db, run_id)
+    status = RunStatus.model_validate(run)
+    status.completed = completed
+    status.errors = errors
+    return status
+
+
+@router.get("/jobs/{run_id}/results", response_model=List[RunTestCase])
+async def get_run_job_results(
+    run_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Return the results of a run recorded so far, ordered by test case id and
+    sample.
+    """
+    run = await run_crud.get_run(db, run_id=run_id, user_id=current_user.id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return _run_log_results(await run_crud.get_run_results(db, run_id))
+
+
+@router.get("/jobs/{run_id}/variance", response_model=List[TestCaseVariance])
+async def get_run_job_variance(
+    run_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Return how much the samples of each test case of a multi-sample run
+    differ from each other.
+    """
+    run = await run_crud.get_run(db, run_id=run_id, user_id=current_user.id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return await output_variance(
+        _run_log_results(await run_crud.get_run_results(db, run_id))
+    )
+
+
+@router.post("/matrix", response_model=MatrixRunResponse)
+async def run_matrix(
+    request: MatrixRunRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Run several versions against all test cases of their prompts in one pass.
+    Every version x test case pair is scheduled through a single shared
+    concurrency pool; each version is recorded as its own run.
+
+    - **version_ids**: IDs of the versions to run
+    - **max_concurrency**: Optional cap on model calls in flight for the matrix
+    - **bypass_cache**: Skip cached completions and call the model
+    """
+    version_ids = list(dict.fromkeys(request.version_ids))
+    versions = {
+        version.id: version
+        for version in await version_crud.get_user_versions(
+            db, version_ids, user_id=current_user.id
+        )
+    }
+    missing = [version_id for version_id in version_ids if version_id not in versions]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Versions not found: {missing}")
+
+    test_cases_by_prompt = {}
+    for version in versions.values():
+        if version.prompt_id not in test_cases_by_prompt:
+            test_cases_by_prompt[version.prompt_id] = (
+                await test_case_crud.get_test_cases_by_prompt(db, version.prompt_id)
             )
-        except Exception as e:
-            results.append(
-                RunTestCase(
-                    test_case_id=tc.id,
-                    user_message=tc.user_message,
-                    output=f"Internal Error: {str(e)}",
-                )
+    if not any(test_cases_by_prompt.values()):
+        raise HTTPException(
+            status_code=404, detail="No test cases found for these versions"
+        )
+
+    runs = {}
+    cells = []
+    for version_id in version_ids:
+        version = versions[version_id]
+        test_cases = test_cases_by_prompt[version.prompt_id]
+        run = await run_crud.create_run(
+            db,
+            user_id=current_user.id,
+            prompt_id=version.prompt_id,
+            system_prompt=version.system_prompt,
+            mode=RUN_MODE_SYNC,
+            status=RUN_RUNNING,
+            total=len(test_cases),
+            max_concurrency=request.max_concurrency,
+            bypass_cache=request.bypass_cache,
+            version_id=version.id,
+        )
+        runs[version_id] = run.id
+        cells.extend(
+            RunCell(run.id, version.prompt_id, version.system_prompt, tc)
+            for tc in test_cases
+        )
+
+    results = {version_id: [] for version_id in version_ids}
+    version_by_run = {run_id: version_id for version_id, run_id in runs.items()}
+    try:
+        async for cell, result in stream_cells(
+            current_user.id,
+            cells,
+            max_concurrency=request.max_concurrency,
+            bypass_cache=request.bypass_cache,
+        ):
+            results[version_by_run[cell.run_id]].append(result)
+    except BaseException as e:
+        for run_id in runs.values():
+            await run_crud.finish_run(db, run_id, error=str(e) or type(e).__name__)
+        raise
+    for run_id in runs.values():
+        await run_crud.finish_run(db, run_id)
+
+    cache_hits = 0
+    matrix = []
+    for version_id in version_ids:
+        version_results = sorted(
+            results[version_id], key=lambda result: result.test_case_id
+        )
+        cache_hits += sum(result.cached for result in version_results)
+        matrix.append(
+            MatrixRunVersion(
+                version_id=version_id,
+                version_number=versions[version_id].number,
+                run_id=runs[version_id],
+                results=version_results,
             )
+        )
+    return MatrixRunResponse(
+        versions=matrix,
+        cache_hits=cache_hits,
+        cache_misses=len(cells) - cache_hits,
+    )
 
-        run_log_crud.create_run_log(
-            db=db,
-            run_log=RunLogCreate(
-                user_id=current_user.id,
-                prompt_id=prompt_id,
-                system_prompt=system_prompt,
-                user_message=tc.user_message,
-                response=output_text,
+
+@router.get("/profile/prompt/{prompt_id}", response_model=List[VersionProfile])
+async def get_version_profiles(
+    prompt_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Performance profile of each version of a prompt across all its runs:
+    call count, error rate, p50/p95 model latency and average tokens per call.
+    Latency and token figures only cover successful, uncached model calls.
+    """
+    prompt = await prompt_crud.get_prompt(
+        db, prompt_id=prompt_id, user_id=current_user.id
+    )
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return [
+        VersionProfile.model_validate(row._asdict())
+        for row in await run_log_crud.get_version_profiles(db, prompt_id)
+    ]
+
+
+@router.get("/daily/prompt/{prompt_id}", response_model=List[DailyRunStats])
+async def get_daily_run_stats(
+    prompt_id: int,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Daily call counts, error and cache hits, token usage and average model
+    latency of a prompt over the last `days` days (UTC), read from the daily
+    rollups. These outlive archived run logs; today's figures are refreshed by
+    the periodic run log maintenance.
+    """
+    prompt = await prompt_crud.get_prompt(
+        db, prompt_id=prompt_id, user_id=current_user.id
+    )
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    return [
+        DailyRunStats(
+            day=rollup.day,
+            calls=rollup.calls,
+            errors=rollup.errors,
+            cache_hits=rollup.cache_hits,
+            model_calls=rollup.model_calls,
+            prompt_tokens=rollup.prompt_tokens,
+            completion_tokens=rollup.completion_tokens,
+            avg_latency_ms=(
+                rollup.latency_ms / rollup.model_calls if rollup.model_calls else None
             ),
         )
-    return RunResponse(results=results)
+        for rollup in await rollup_crud.get_daily_rollups(db, prompt_id, since)
+    ]
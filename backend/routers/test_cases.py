@@ -1,22 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_read_db
 from crud import test_case as crud
+from crud import prompt as prompt_crud
 from schemas import test_case as schemas
+from schemas.pagination import Page
 from utils.auth import get_current_user
+from utils.etag import user_prompt_etag
+from utils.pagination import PageParams, cursor_key, paginate
+from utils.test_case_io import (
+    MEDIA_TYPES,
+    TestCaseImportError,
+    export_test_cases,
+    import_format,
+    import_test_cases,
+)
 from models.user import User
 
 router = APIRouter()
 
 
 @router.post("/", response_model=schemas.TestCase)
-def create_test_case(
+async def create_test_case(
     test_case: schemas.TestCaseCreate,
     prompt_id: int = Query(
         ..., description="ID of the prompt this test case belongs to"
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -26,38 +38,121 @@ def create_test_case(
     - **user_message**: The input message for the test case
     - **expected_output**: The expected output for the test case
     """
-    return crud.create_test_case(db=db, test_case=test_case, prompt_id=prompt_id)
+    return await crud.create_test_case(db=db, test_case=test_case, prompt_id=prompt_id)
+
+
+@router.post("/prompt/{prompt_id}/import", response_model=schemas.TestCaseImportResult)
+async def import_test_cases_for_prompt(
+    prompt_id: int,
+    request: Request,
+    format: Optional[str] = Query(
+        None, pattern="^(ndjson|csv)$", description="Defaults from Content-Type"
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Import many test cases from the request body, streamed as NDJSON (one
+    `{"user_message": ...}` object per line) or CSV with a `user_message`
+    column. Rows are inserted in chunks within one transaction; if any row is
+    invalid nothing is stored and the invalid lines are returned with a 422.
+    """
+    prompt = await prompt_crud.get_prompt(
+        db, prompt_id=prompt_id, user_id=current_user.id
+    )
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    format = format or import_format(request.headers.get("content-type"))
+    if format is None:
+        raise HTTPException(
+            status_code=415, detail="Send NDJSON (application/x-ndjson) or text/csv"
+        )
+    try:
+        imported = await import_test_cases(db, prompt_id, request.stream(), format)
+    except TestCaseImportError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    return schemas.TestCaseImportResult(imported=imported)
+
+
+@router.get("/prompt/{prompt_id}/export")
+async def export_test_cases_for_prompt(
+    prompt_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream every test case of a prompt, in id order, as NDJSON or CSV.
+    """
+    prompt = await prompt_crud.get_prompt(
+        db, prompt_id=prompt_id, user_id=current_user.id
+    )
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return StreamingResponse(
+        export_test_cases(db, prompt_id, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="test_cases_{prompt_id}.{format}"'
+            )
+        },
+    )
 
 
 @router.get("/{test_case_id}", response_model=schemas.TestCase)
-def read_test_case(
+async def read_test_case(
     test_case_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_test_case = crud.get_test_case(db, test_case_id=test_case_id)
+    db_test_case = await crud.get_test_case(db, test_case_id=test_case_id)
     if db_test_case is None:
         raise HTTPException(status_code=404, detail="Test case not found")
     return db_test_case
 
 
-@router.get("/prompt/{prompt_id}", response_model=List[schemas.TestCase])
-def read_test_cases_by_prompt(
+@router.get(
+    "/prompt/{prompt_id}",
+    response_model=Page[schemas.TestCase],
+    dependencies=[Depends(user_prompt_etag)],
+)
+async def read_test_cases_by_prompt(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    return crud.get_test_cases_by_prompt(db, prompt_id=prompt_id)
+    """
+    List the test cases of a prompt in creation (id) order. Pass `next_cursor`
+    from the response as `cursor` to fetch the following page.
+
+    Responses carry an ETag; send it back as `If-None-Match` to get a 304 when
+    the prompt is unchanged.
+    """
+    prompt = await prompt_crud.get_prompt(
+        db, prompt_id=prompt_id, user_id=current_user.id
+    )
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    after = cursor_key(page.after, int)
+    test_cases = await crud.get_test_cases_page(
+        db,
+        prompt_id=prompt_id,
+        limit=page.limit + 1,
+        after_id=after[0] if after else None,
+    )
+    return paginate(test_cases, page.limit, key=lambda test_case: (test_case.id,))
 
 
 @router.put("/{test_case_id}", response_model=schemas.TestCase)
-def update_test_case(
+async def update_test_case(
     test_case_id: int,
     test_case: schemas.TestCaseUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_test_case = crud.update_test_case(
+    db_test_case = await crud.update_test_case(
         db, test_case_id=test_case_id, test_case=test_case
     )
     if db_test_case is None:
@@ -66,12 +161,12 @@ def update_test_case(
 
 
 @router.delete("/{test_case_id}")
-def delete_test_case(
+async def delete_test_case(
     test_case_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    success = crud.delete_test_case(db, test_case_id=test_case_id)
+    success = await crud.delete_test_case(db, test_case_id=test_case_id)
     if not success:
         raise HTTPException(status_code=404, detail="Test case not found")
     return {"message": "Test case deleted successfully"}
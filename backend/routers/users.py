@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_read_db
+from schemas.pagination import Page
 from schemas.user import User
 from crud import user as crud_user
 from utils.auth import get_current_user
+from utils.pagination import PageParams, cursor_key, paginate
 
 router = APIRouter()
 
@@ -15,7 +16,12 @@ async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-@router.get("/", response_model=List[User])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud_user.get_users(db, skip=skip, limit=limit)
-    return users
+@router.get("/", response_model=Page[User])
+async def get_users(
+    page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)
+):
+    after = cursor_key(page.after, int)
+    users = await crud_user.get_users(
+        db, limit=page.limit + 1, after_id=after[0] if after else None
+    )
+    return paginate(users, page.limit, key=lambda user: (user.id,))
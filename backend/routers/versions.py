@@ -1,47 +1,98 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_db, get_read_db
 from crud import version as crud
-from schemas.version import Version, VersionCreate
+from schemas.pagination import Page
+from schemas.version import Version, VersionCreate, VersionDiff
+from utils.auth import get_current_user
+from utils.diff import diff_versions
+from utils.etag import prompt_etag
+from utils.pagination import PageParams, cursor_key, paginate
 
 router = APIRouter()
 
 
 @router.post("/", response_model=Version)
-def create_version(
+async def create_version(
     version: VersionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    return crud.create_version(db=db, version=version)
+    return await crud.create_version(db=db, version=version)
 
 
-@router.get("/prompt/{prompt_id}", response_model=List[Version])
-def get_versions_by_prompt(
+@router.get(
+    "/prompt/{prompt_id}",
+    response_model=Page[Version],
+    dependencies=[Depends(prompt_etag)],
+)
+async def get_versions_by_prompt(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return crud.get_versions_by_prompt(db=db, prompt_id=prompt_id)
+    """
+    List the versions of a prompt, newest first. Pass `next_cursor` from the
+    response as `cursor` to fetch the following page.
+
+    Responses carry an ETag; send it back as `If-None-Match` to get a 304 when
+    the prompt is unchanged.
+    """
+    before = cursor_key(page.after, int)
+    versions = await crud.get_versions_by_prompt(
+        db=db,
+        prompt_id=prompt_id,
+        limit=page.limit + 1,
+        before_number=before[0] if before else None,
+    )
+    return paginate(versions, page.limit, key=lambda version: (version.number,))
 
 
 @router.get("/{version_id}", response_model=Version)
-def get_version(
+async def get_version(
     version_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    db_version = crud.get_version(db, version_id=version_id)
+    db_version = await crud.get_version(db, version_id=version_id)
     if db_version is None:
         raise HTTPException(status_code=404, detail="Version not found")
     return db_version
 
 
-@router.get("/current/{prompt_id}", response_model=Version)
-def get_current_version(
+@router.get("/{version_id}/diff/{other_version_id}", response_model=VersionDiff)
+async def get_version_diff(
+    version_id: int,
+    other_version_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Word-level diff of each test case's latest output under version
+    `version_id` against its latest output under `other_version_id`, with a
+    similarity score (1.0 when unchanged) per test case.
+    """
+    versions = await crud.get_user_versions(
+        db, [version_id, other_version_id], user_id=current_user.id
+    )
+    if len({version.id for version in versions}) < len({version_id, other_version_id}):
+        raise HTTPException(status_code=404, detail="Version not found")
+    if len({version.prompt_id for version in versions}) > 1:
+        raise HTTPException(
+            status_code=400, detail="Versions belong to different prompts"
+        )
+    return await diff_versions(db, version_id, other_version_id)
+
+
+@router.get(
+    "/current/{prompt_id}",
+    response_model=Version,
+    dependencies=[Depends(prompt_etag)],
+)
+async def get_current_version(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    db_version = crud.get_current_version(db, prompt_id=prompt_id)
+    db_version = await crud.get_current_version(db, prompt_id=prompt_id)
     if db_version is None:
         raise HTTPException(status_code=404, detail="No versions found for this prompt")
     return db_version
@@ -21,3 +21,13 @@ class Prompt(PromptBase):
         return dt.isoformat() if dt else None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class PromptSummary(Prompt):
+    test_case_count: int
+    latest_version: Optional[int] = None
+    last_run_at: Optional[datetime] = None
+
+    @field_serializer("last_run_at")
+    def serialize_last_run_at(self, dt: Optional[datetime], _info):
+        return dt.isoformat() if dt else None
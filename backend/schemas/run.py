@@ -1,16 +1,161 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+from datetime import date, datetime
 
 
 class RunTestCase(BaseModel):
     test_case_id: int
+    sample_index: int = 0
     user_message: str
     output: str
+    error: bool = False
+    cached: bool = False
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    latency_ms: Optional[float] = None
+    finish_reason: Optional[str] = None
+
+
+class TestCaseVariance(BaseModel):
+    test_case_id: int
+    samples: int
+    errors: int = 0
+    distinct_outputs: int
+    # Mean pairwise word-level similarity of the samples (1.0 when identical)
+    mean_similarity: Optional[float] = None
 
 
 class RunResponse(BaseModel):
+    run_id: Optional[int] = None
     results: List[RunTestCase]
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # Only for runs with several samples per test case
+    variance: Optional[List[TestCaseVariance]] = None
+
+
+class RunProgress(BaseModel):
+    completed: int
+    total: int
+
+
+class RunSummary(BaseModel):
+    run_id: Optional[int] = None
+    total: int
+    errors: int
+    cache_hits: int = 0
+    cache_misses: int = 0
 
 
 class RunRequest(BaseModel):
     system_prompt: str
+    max_concurrency: Optional[int] = Field(
+        default=None, ge=1, description="Maximum model calls in flight for this run"
+    )
+    bypass_cache: bool = Field(
+        default=False, description="Skip cached completions and call the model"
+    )
+    version_id: Optional[int] = Field(
+        default=None, description="Version of the prompt being run, if saved"
+    )
+    sample_fraction: Optional[float] = Field(
+        default=None,
+        gt=0,
+        le=1,
+        description="Only run this fraction of the test cases; complete it later",
+    )
+    sample_seed: int = Field(
+        default=0, description="Seed of the sample; keep it to compare runs"
+    )
+    sample_changed_first: bool = Field(
+        default=False,
+        description="Fill the sample with the most recently changed outputs first",
+    )
+    temperature: float = Field(default=0.7, ge=0, le=2)
+    top_p: Optional[float] = Field(default=None, gt=0, le=1)
+    max_tokens: Optional[int] = Field(default=None, ge=1)
+    seed: Optional[int] = Field(
+        default=None, description="Best-effort deterministic sampling"
+    )
+    samples_per_case: int = Field(
+        default=1,
+        ge=1,
+        le=20,
+        description="Outputs sampled per test case, all from a single call",
+    )
+
+
+class MatrixRunRequest(BaseModel):
+    version_ids: List[int] = Field(min_length=1)
+    max_concurrency: Optional[int] = Field(
+        default=None, ge=1, description="Maximum model calls in flight for the matrix"
+    )
+    bypass_cache: bool = Field(
+        default=False, description="Skip cached completions and call the model"
+    )
+
+
+class MatrixRunVersion(BaseModel):
+    version_id: int
+    version_number: int
+    run_id: int
+    results: List[RunTestCase]
+
+
+class MatrixRunResponse(BaseModel):
+    versions: List[MatrixRunVersion]
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+class RunStatus(BaseModel):
+    id: int
+    prompt_id: Optional[int] = None
+    version_id: Optional[int] = None
+    mode: str
+    status: str
+    total: int
+    completed: int = 0
+    errors: int = 0
+    error: Optional[str] = None
+    sample_fraction: Optional[float] = None
+    sample_seed: Optional[int] = None
+    temperature: float = 0.7
+    top_p: Optional[float] = None
+    max_tokens: Optional[int] = None
+    seed: Optional[int] = None
+    samples_per_case: int = 1
+    batch_id: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class VersionProfile(BaseModel):
+    version_id: int
+    version_number: int
+    calls: int
+    errors: int
+    error_rate: float
+    p50_latency_ms: Optional[float] = None
+    p95_latency_ms: Optional[float] = None
+    avg_prompt_tokens: Optional[float] = None
+    avg_completion_tokens: Optional[float] = None
+    avg_total_tokens: Optional[float] = None
+
+
+class DailyRunStats(BaseModel):
+    # model_calls would otherwise clash with pydantic's "model_" namespace
+    model_config = ConfigDict(protected_namespaces=())
+
+    day: date
+    calls: int
+    errors: int
+    cache_hits: int
+    model_calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency_ms: Optional[float] = None
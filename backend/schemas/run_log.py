@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 
 class RunLogBase(BaseModel):
@@ -7,6 +8,15 @@ class RunLogBase(BaseModel):
     system_prompt: str
     user_message: str
     response: str
+    run_id: Optional[int] = None
+    test_case_id: Optional[int] = None
+    sample_index: int = 0
+    error: bool = False
+    cached: bool = False
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    latency_ms: Optional[float] = None
+    finish_reason: Optional[str] = None
 
 
 class RunLogCreate(RunLogBase):
@@ -20,3 +20,7 @@ class TestCase(TestCaseBase):
 
     class Config:
         orm_mode = True
+
+
+class TestCaseImportResult(BaseModel):
+    imported: int
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 
 class VersionBase(BaseModel):
@@ -18,3 +19,30 @@ class Version(VersionBase):
 
     class Config:
         from_attributes = True
+
+
+class DiffSegment(BaseModel):
+    op: str  # equal, delete or insert
+    text: str
+
+
+class TestCaseDiff(BaseModel):
+    test_case_id: int
+    user_message: Optional[str] = None
+    from_run_id: int
+    to_run_id: int
+    from_error: bool = False
+    to_error: bool = False
+    similarity: float
+    segments: List[DiffSegment]
+
+
+class VersionDiff(BaseModel):
+    from_version_id: int
+    to_version_id: int
+    # Mean similarity over the paired test cases
+    similarity: Optional[float] = None
+    changed: int
+    test_cases: List[TestCaseDiff]
+    # Test cases with an output under only one of the versions
+    unpaired_test_case_ids: List[int]
@@ -0,0 +1,48 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The app's modules import from the backend directory and build their engine
+# from DATABASE_URL at import time; the app under test gets a throwaway
+# SQLite database, the index tests create their own engines
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_database_dir = tempfile.mkdtemp(prefix="prompt-profiler-tests-")
+atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+)
+# Model calls go nowhere; tests never reach the model
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://127.0.0.1:9")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-02-01")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT_NAME", "test")
+os.environ.setdefault("ALLOWED_ORIGINS", "[]")
+
+from bench import stub_auth  # noqa: E402
+
+stub_auth.install()
+
+
+def auth(uid: str) -> dict:
+    """
+    Headers authenticating as the user with Firebase uid `uid`.
+    """
+    return {"Authorization": f"Bearer {uid}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    The app, started once for the session. Coroutines that need the app's
+    event loop, e.g. to seed rows, run through `client.portal.call`.
+    """
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
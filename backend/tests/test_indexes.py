@@ -0,0 +1,117 @@
+"""
+The hot per-prompt and per-user lookups must be answered from their indexes.
+
+Each lookup runs against an empty SQLite schema; the plan of every statement
+it executes is taken with EXPLAIN QUERY PLAN, where an index lookup shows as
+"SEARCH <table> USING INDEX <index>" and a full-table scan as "SCAN <table>".
+"""
+
+import asyncio
+import re
+from typing import List
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401  (registers every table on Base)
+from crud import prompt as prompt_crud
+from crud import run_log as run_log_crud
+from crud import test_case as test_case_crud
+from crud import version as version_crud
+from database import Base
+
+
+def query_plans(lookup) -> List[str]:
+    """
+    Run `lookup(db)` and return the plan lines of every statement it executed.
+    """
+
+    async def run() -> List[str]:
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            executed.append((statement, parameters))
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        async with AsyncSession(engine) as db:
+            await lookup(db)
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        plans = []
+        async with engine.connect() as conn:
+            for statement, parameters in executed:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )
+                plans.extend(row[-1] for row in result)
+        await engine.dispose()
+        return plans
+
+    return asyncio.run(run())
+
+
+def assert_uses_index(plans: List[str], table: str, index: str) -> None:
+    assert not [line for line in plans if re.match(rf"SCAN {table}\b", line)], plans
+    search = re.compile(rf"SEARCH {table} USING (COVERING )?INDEX {index}\b")
+    assert any(search.match(line) for line in plans), plans
+
+
+@pytest.mark.parametrize(
+    "lookup, table, index",
+    [
+        (
+            lambda db: test_case_crud.get_test_cases_by_prompt(db, 1),
+            "test_cases",
+            "ix_test_cases_prompt_id_id",
+        ),
+        (
+            lambda db: test_case_crud.get_test_cases_page(db, 1, after_id=10),
+            "test_cases",
+            "ix_test_cases_prompt_id_id",
+        ),
+        (
+            lambda db: version_crud.get_current_version(db, 1),
+            "versions",
+            "ix_versions_prompt_id_number",
+        ),
+        (
+            lambda db: version_crud.get_versions_by_prompt(db, 1, before_number=5),
+            "versions",
+            "ix_versions_prompt_id_number",
+        ),
+        (
+            lambda db: run_log_crud.get_changed_test_case_ids(db, 1),
+            "run_logs",
+            "ix_run_logs_prompt_id_created_at",
+        ),
+        (
+            lambda db: prompt_crud.get_prompts(db, 1),
+            "prompts",
+            "ix_prompts_user_id_created_at",
+        ),
+    ],
+    ids=[
+        "test_cases_by_prompt",
+        "test_cases_page",
+        "current_version",
+        "versions_page",
+        "run_logs_by_prompt",
+        "prompts_by_user",
+    ],
+)
+def test_lookup_uses_index(lookup, table, index):
+    assert_uses_index(query_plans(lookup), table, index)
+
+
+def test_prompt_summaries_use_indexes():
+    plans = query_plans(lambda db: prompt_crud.get_prompt_summaries(db, 1))
+    assert_uses_index(plans, "prompts", "ix_prompts_user_id_created_at")
+    assert_uses_index(plans, "test_cases", "ix_test_cases_prompt_id_id")
+    assert_uses_index(plans, "versions", "ix_versions_prompt_id_number")
+    assert_uses_index(plans, "run_logs", "ix_run_logs_prompt_id_created_at")
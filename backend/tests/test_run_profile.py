@@ -0,0 +1,121 @@
+"""
+The per-version profile reports latency percentiles interpolated like
+Postgres' percentile_cont, over successful, uncached calls only.
+"""
+
+from typing import List, Optional
+
+import pytest
+
+from conftest import auth
+from crud import run as run_crud
+from crud import run_log as run_log_crud
+from database import SessionLocal
+from models.run import RUN_COMPLETED, RUN_MODE_SYNC
+from schemas.run_log import RunLogCreate
+
+SYSTEM_PROMPT = "You are a profiler."
+
+
+def seed_run(
+    client, user_id: int, prompt_id: int, version_id: int, logs: List[dict]
+) -> None:
+    async def seed():
+        async with SessionLocal() as db:
+            run = await run_crud.create_run(
+                db,
+                user_id=user_id,
+                prompt_id=prompt_id,
+                system_prompt=SYSTEM_PROMPT,
+                mode=RUN_MODE_SYNC,
+                status=RUN_COMPLETED,
+                total=len(logs),
+                version_id=version_id,
+            )
+            await run_log_crud.create_run_logs(
+                db,
+                [
+                    RunLogCreate(
+                        user_id=user_id,
+                        prompt_id=prompt_id,
+                        system_prompt=SYSTEM_PROMPT,
+                        user_message=f"m{i}",
+                        response="out",
+                        run_id=run.id,
+                        **log,
+                    )
+                    for i, log in enumerate(logs)
+                ],
+            )
+
+    client.portal.call(seed)
+
+
+def create_version(client, headers: dict, prompt_id: int) -> int:
+    response = client.post(
+        "/versions/",
+        json={"system_prompt": SYSTEM_PROMPT, "prompt_id": prompt_id},
+        headers=headers,
+    )
+    return response.json()["id"]
+
+
+def latencies(*values: Optional[float]) -> List[dict]:
+    return [{"latency_ms": value} for value in values]
+
+
+def test_profile_percentiles(client):
+    headers = auth("profile-owner")
+    user_id = client.get("/users/me", headers=headers).json()["id"]
+    prompt_id = client.post("/prompts/", json={"name": "p"}, headers=headers).json()[
+        "id"
+    ]
+    first, second, third = (create_version(client, headers, prompt_id) for _ in "123")
+
+    # Two runs of one version are profiled together; cached calls and errors
+    # count as calls but not towards the latency
+    seed_run(client, user_id, prompt_id, first, latencies(30, 10, 50))
+    seed_run(
+        client,
+        user_id,
+        prompt_id,
+        first,
+        latencies(40, 20)
+        + [
+            {"latency_ms": 1000, "cached": True},
+            {"latency_ms": 2000, "error": True},
+        ],
+    )
+    seed_run(client, user_id, prompt_id, second, latencies(200, 100))
+    seed_run(client, user_id, prompt_id, third, [{"error": True}])
+
+    response = client.get(f"/run/profile/prompt/{prompt_id}", headers=headers)
+
+    assert response.status_code == 200
+    profiles = {profile["version_id"]: profile for profile in response.json()}
+    assert [profile["version_id"] for profile in response.json()] == [
+        third,
+        second,
+        first,
+    ]
+    assert profiles[first]["calls"] == 7
+    assert profiles[first]["errors"] == 1
+    assert profiles[first]["p50_latency_ms"] == pytest.approx(30)
+    assert profiles[first]["p95_latency_ms"] == pytest.approx(48)
+    assert profiles[second]["p50_latency_ms"] == pytest.approx(150)
+    assert profiles[second]["p95_latency_ms"] == pytest.approx(195)
+    assert profiles[third]["error_rate"] == 1
+    assert profiles[third]["p50_latency_ms"] is None
+    assert profiles[third]["p95_latency_ms"] is None
+
+
+def test_profile_of_another_users_prompt(client):
+    prompt_id = client.post(
+        "/prompts/", json={"name": "p"}, headers=auth("profile-owner")
+    ).json()["id"]
+
+    response = client.get(
+        f"/run/profile/prompt/{prompt_id}", headers=auth("profile-other")
+    )
+
+    assert response.status_code == 404
@@ -0,0 +1,55 @@
+"""
+Listing a prompt's test cases answers a matching If-None-Match with a 304 for
+the prompt's owner, and hides the prompt from every other user.
+"""
+
+from conftest import auth
+
+OWNER = auth("etag-owner")
+OTHER = auth("etag-other")
+
+
+def create_prompt(client) -> int:
+    prompt_id = client.post("/prompts/", json={"name": "p"}, headers=OWNER).json()["id"]
+    client.post(
+        f"/test-cases/?prompt_id={prompt_id}",
+        json={"user_message": "hello"},
+        headers=OWNER,
+    )
+    return prompt_id
+
+
+def test_unchanged_list_is_not_modified(client):
+    prompt_id = create_prompt(client)
+    url = f"/test-cases/prompt/{prompt_id}"
+
+    first = client.get(url, headers=OWNER)
+    etag = first.headers["ETag"]
+    again = client.get(url, headers={**OWNER, "If-None-Match": etag})
+    client.post(
+        f"/test-cases/?prompt_id={prompt_id}",
+        json={"user_message": "again"},
+        headers=OWNER,
+    )
+    changed = client.get(url, headers={**OWNER, "If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert [tc["user_message"] for tc in first.json()["items"]] == ["hello"]
+    assert again.status_code == 304
+    assert again.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["items"]) == 2
+
+
+def test_list_of_another_users_prompt(client):
+    prompt_id = create_prompt(client)
+    url = f"/test-cases/prompt/{prompt_id}"
+    etag = client.get(url, headers=OWNER).headers["ETag"]
+
+    for headers in ({}, {"If-None-Match": etag}, {"If-None-Match": "*"}):
+        response = client.get(url, headers={**OTHER, **headers})
+
+        assert response.status_code == 404
+        assert "ETag" not in response.headers
+        assert "hello" not in response.text
@@ -0,0 +1,65 @@
+"""
+Malformed import bodies are rejected with a 422 listing the offending line,
+and nothing is stored.
+"""
+
+from conftest import auth
+
+HEADERS = auth("import-owner")
+
+
+def create_prompt(client) -> int:
+    return client.post("/prompts/", json={"name": "p"}, headers=HEADERS).json()["id"]
+
+
+def import_body(client, prompt_id: int, body: bytes, content_type: str):
+    return client.post(
+        f"/test-cases/prompt/{prompt_id}/import",
+        content=body,
+        headers={**HEADERS, "Content-Type": content_type},
+    )
+
+
+def test_import_ndjson(client):
+    prompt_id = create_prompt(client)
+
+    response = import_body(
+        client,
+        prompt_id,
+        b'{"user_message": "a\\u2028b"}\r\n{"user_message": "c"}\n',
+        "application/x-ndjson",
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2}
+
+
+def test_import_invalid_utf8(client):
+    prompt_id = create_prompt(client)
+
+    response = import_body(
+        client,
+        prompt_id,
+        b'{"user_message": "a"}\n{"user_message": "b"}\n{"user_message": "\xff"}\n',
+        "application/x-ndjson",
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == [{"line": 3, "error": "Invalid UTF-8"}]
+    listed = client.get(f"/test-cases/prompt/{prompt_id}", headers=HEADERS).json()
+    assert listed["items"] == []
+
+
+def test_import_malformed_csv_row(client):
+    prompt_id = create_prompt(client)
+
+    response = import_body(
+        client, prompt_id, b"user_message\nfine\nbroken\rrow\nfine\n", "text/csv"
+    )
+
+    assert response.status_code == 422
+    [error] = response.json()["detail"]
+    assert error["line"] == 3
+    assert error["error"].startswith("Invalid CSV: ")
+    listed = client.get(f"/test-cases/prompt/{prompt_id}", headers=HEADERS).json()
+    assert listed["items"] == []
@@ -1,9 +1,14 @@
+import hashlib
+import os
+import time
 from fastapi import Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from utils.firebase import get_firebase_user, verify_firebase_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.firebase import get_firebase_user, decode_firebase_token
+from utils.cache import LRUCache
+from utils.metrics import stage
 from crud import user as crud_user
-from schemas.user import UserCreate
+from schemas.user import User, UserCreate
 from database import get_db
 from dotenv import load_dotenv
 
@@ -11,28 +16,65 @@ load_dotenv()
 
 security = HTTPBearer()
 
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# How long a resolved user is reused before it is reloaded from the database
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+
+# Token digest -> Firebase uid, each entry expiring with the token's `exp`
+_token_cache = LRUCache(AUTH_CACHE_SIZE)
+# Firebase uid -> User
+_user_cache = LRUCache(AUTH_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL)
+
+
+async def get_firebase_uid(token: str) -> str:
+    """
+    Verify a Firebase ID token, reusing earlier verifications until it expires.
+    """
+    token_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    firebase_uid = _token_cache.get(token_key)
+    if firebase_uid is not None:
+        return firebase_uid
+
+    with stage("auth"):
+        decoded_token = await decode_firebase_token(token)
+    firebase_uid = decoded_token["uid"]
+    ttl = decoded_token["exp"] - time.time()
+    if ttl > 0:
+        _token_cache.set(token_key, firebase_uid, ttl=ttl)
+    return firebase_uid
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
+    db: AsyncSession = Depends(get_db),
+) -> User:
     """
     Verify Firebase token and return the corresponding user from our database.
     If the user doesn't exist in our database, create it.
+
+    Verified tokens and resolved users are cached, so repeat requests skip both
+    Firebase and the database. The Firebase user record is only fetched when a
+    new local user has to be created.
     """
-    token = credentials.credentials
-    firebase_uid = await verify_firebase_token(token)
-    firebase_user = await get_firebase_user(firebase_uid)
+    firebase_uid = await get_firebase_uid(credentials.credentials)
+
+    user = _user_cache.get(firebase_uid)
+    if user is not None:
+        return user
 
     # Check if user exists in our database
-    user = crud_user.get_user_by_firebase_uid(db, firebase_uid)
+    db_user = await crud_user.get_user_by_firebase_uid(db, firebase_uid)
 
-    if not user:
+    if not db_user:
         # Create user in our database if they don't exist
+        with stage("auth"):
+            firebase_user = await get_firebase_user(firebase_uid)
         user_data = UserCreate(
             email=firebase_user.email,
             firebase_uid=firebase_uid,
         )
-        user = crud_user.create_user_from_firebase(db, user_data, firebase_uid)
+        db_user = await crud_user.create_user_from_firebase(db, user_data, firebase_uid)
 
+    user = User.model_validate(db_user)
+    _user_cache.set(firebase_uid, user)
     return user
@@ -0,0 +1,338 @@
+"""
+Offline batch runs.
+
+Instead of calling the model once per test case, a batch run serializes its
+requests to a JSONL batch file and submits it through a batch backend (see
+`utils.batch_backends`), which runs them outside the deployment's rate limits
+at a lower price, within hours rather than seconds. `BatchPoller` periodically:
+
+- submits queued batch runs: samples already in the completion cache are
+  logged straight away, the requests of the other test cases are written to
+  a batch file in BATCH_DIR and submitted;
+- polls the submitted batches and bulk-ingests the results of finished ones
+  into run_logs and the completion cache, then finishes the run.
+
+The test cases sent in a batch are recorded with it, so its results are
+ingested against exactly those even if the prompt's test cases change in the
+meantime. A restart picks up where the previous process stopped: submitted
+batches are polled again and test cases already logged are not ingested twice.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import List, Optional
+from dotenv import load_dotenv
+from openai.types.chat import ChatCompletion
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, engine
+from crud import run as run_crud
+from crud import run_log as run_log_crud
+from models.run import Run, RUN_MODE_BATCH
+from models.test_case import TestCase
+from schemas.run_log import RunLogCreate
+from utils import llm
+from utils.batch_backends import (
+    BATCH_DEPLOYMENT_NAME,
+    BATCH_DIR,
+    BATCH_ENDPOINT,
+    BatchBackend,
+    get_batch_backend,
+)
+from utils.jobs import pending_test_cases, run_sampling_params
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the submitted batches
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "60"))
+
+# Run logs inserted per statement while ingesting results
+BATCH_INGEST_CHUNK_SIZE = 500
+# Postgres advisory lock held during a pass, so only one process ingests
+_ADVISORY_LOCK_KEY = 72836141
+
+
+def batch_request(db_run: Run, tc: TestCase) -> dict:
+    """
+    The batch file line requesting the samples of one test case of a run.
+    """
+    return {
+        "custom_id": str(tc.id),
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": llm.request_body(
+            db_run.system_prompt.content,
+            tc.user_message,
+            run_sampling_params(db_run),
+            db_run.samples_per_case,
+            model=BATCH_DEPLOYMENT_NAME,
+        ),
+    }
+
+
+def write_batch_file(path: str, requests: List[dict]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as batch_file:
+        for request in requests:
+            batch_file.write(json.dumps(request) + "\n")
+
+
+def _run_log(
+    db_run: Run, tc: TestCase, sample_index: int, completion: llm.Completion
+) -> RunLogCreate:
+    return RunLogCreate(
+        user_id=db_run.user_id,
+        prompt_id=db_run.prompt_id,
+        system_prompt=db_run.system_prompt.content,
+        user_message=tc.user_message,
+        response=completion.output,
+        run_id=db_run.id,
+        test_case_id=tc.id,
+        sample_index=sample_index,
+        cached=completion.cached,
+        prompt_tokens=completion.prompt_tokens,
+        completion_tokens=completion.completion_tokens,
+        latency_ms=completion.latency_ms,
+        finish_reason=completion.finish_reason,
+    )
+
+
+def _error_log(db_run: Run, tc: TestCase, output: str) -> RunLogCreate:
+    return RunLogCreate(
+        user_id=db_run.user_id,
+        prompt_id=db_run.prompt_id,
+        system_prompt=db_run.system_prompt.content,
+        user_message=tc.user_message,
+        response=output,
+        run_id=db_run.id,
+        test_case_id=tc.id,
+        error=True,
+    )
+
+
+async def _insert_run_logs(run_logs: List[RunLogCreate]) -> None:
+    async with SessionLocal() as db:
+        for start in range(0, len(run_logs), BATCH_INGEST_CHUNK_SIZE):
+            await run_log_crud.create_run_logs(
+                db, run_logs[start : start + BATCH_INGEST_CHUNK_SIZE]
+            )
+
+
+async def _finish_run(run_id: int, error: Optional[str] = None) -> None:
+    async with SessionLocal() as db:
+        await run_crud.finish_run(db, run_id, error=error)
+
+
+async def submit_batch_run(backend: BatchBackend, db_run: Run) -> None:
+    """
+    Log the cached samples of a claimed batch run and submit a batch for the
+    rest of its test cases; a run with nothing left to request is finished.
+    """
+    async with SessionLocal() as db:
+        test_cases = await pending_test_cases(db, db_run)
+
+    cached_logs = []
+    requests = []
+    for tc in test_cases:
+        if not db_run.bypass_cache:
+            completions = await llm.cached_completions(
+                db_run.system_prompt.content,
+                tc.user_message,
+                run_sampling_params(db_run),
+                db_run.samples_per_case,
+            )
+            if all(completion is not None for completion in completions):
+                cached_logs.extend(
+                    _run_log(db_run, tc, sample_index, completion)
+                    for sample_index, completion in enumerate(completions)
+                )
+                continue
+        requests.append(batch_request(db_run, tc))
+    await _insert_run_logs(cached_logs)
+    if not requests:
+        await _finish_run(db_run.id)
+        return
+
+    path = os.path.join(BATCH_DIR, f"run_{db_run.id}.jsonl")
+    await run_in_threadpool(write_batch_file, path, requests)
+    try:
+        batch_id = await backend.submit(path)
+    finally:
+        os.remove(path)
+    async with SessionLocal() as db:
+        await run_crud.set_run_batch(
+            db,
+            db_run.id,
+            batch_id,
+            [int(request["custom_id"]) for request in requests],
+        )
+    logger.info(
+        "Submitted %s requests of run %s as batch %s",
+        len(requests),
+        db_run.id,
+        batch_id,
+    )
+
+
+async def _result_logs(db_run: Run, tc: TestCase, result: dict) -> List[RunLogCreate]:
+    response = result.get("response") or {}
+    body = response.get("body") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        error = result.get("error") or body.get("error") or {}
+        message = error.get("message") or f"status {response.get('status_code')}"
+        return [_error_log(db_run, tc, f"OpenAI Error: {message}")]
+    try:
+        completions = await llm.store_completions(
+            db_run.system_prompt.content,
+            tc.user_message,
+            run_sampling_params(db_run),
+            list(range(db_run.samples_per_case)),
+            ChatCompletion.model_validate(body),
+        )
+    except Exception as e:
+        return [_error_log(db_run, tc, f"Internal Error: {str(e)}")]
+    return [
+        _run_log(db_run, tc, sample_index, completion)
+        for sample_index, completion in enumerate(completions)
+    ]
+
+
+async def ingest_batch_run(backend: BatchBackend, db_run: Run) -> int:
+    """
+    Bulk-insert the results of a finished batch as run logs of its run,
+    skipping test cases that already have one. Returns the number of test
+    cases sent in the batch left without a result.
+    """
+    async with SessionLocal() as db:
+        completed_ids = await run_crud.get_completed_test_case_ids(db, db_run.id)
+        test_cases = {
+            tc.id: tc
+            for tc in await run_crud.get_run_test_cases(db, db_run.id, submitted=True)
+            if tc.id not in completed_ids
+        }
+
+    run_logs: List[RunLogCreate] = []
+    async for result in backend.results(db_run.batch_id):
+        tc = test_cases.pop(int(result["custom_id"]), None)
+        if tc is None:
+            continue
+        run_logs.extend(await _result_logs(db_run, tc, result))
+        if len(run_logs) >= BATCH_INGEST_CHUNK_SIZE:
+            await _insert_run_logs(run_logs)
+            run_logs = []
+    await _insert_run_logs(run_logs)
+    return len(test_cases)
+
+
+class BatchPoller:
+    """
+    Background task submitting queued batch runs and ingesting finished
+    batches every `interval` seconds, or sooner when notified.
+    """
+
+    def __init__(
+        self,
+        interval: float = BATCH_POLL_INTERVAL,
+        backend: Optional[BatchBackend] = None,
+    ):
+        self.interval = interval
+        self._backend = backend
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backend(self) -> BatchBackend:
+        if self._backend is None:
+            self._backend = get_batch_backend()
+        return self._backend
+
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self) -> None:
+        """
+        Run a pass now, e.g. after a batch run has been queued.
+        """
+        self._wakeup.set()
+
+    async def run_once(self) -> None:
+        conn = await engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            postgres = conn.dialect.name == "postgresql"
+            if postgres:
+                locked = await conn.scalar(
+                    text("SELECT pg_try_advisory_lock(:key)"),
+                    {"key": _ADVISORY_LOCK_KEY},
+                )
+                if not locked:
+                    return
+            try:
+                await self._submit_queued()
+                await self._check_submitted()
+            finally:
+                if postgres:
+                    await conn.execute(
+                        text("SELECT pg_advisory_unlock(:key)"),
+                        {"key": _ADVISORY_LOCK_KEY},
+                    )
+        finally:
+            await conn.close()
+
+    async def _submit_queued(self) -> None:
+        while True:
+            async with SessionLocal() as db:
+                db_run = await run_crud.claim_next_run(db, mode=RUN_MODE_BATCH)
+            if db_run is None:
+                return
+            try:
+                await submit_batch_run(self.backend, db_run)
+            except Exception as e:
+                logger.exception("Submitting run %s failed", db_run.id)
+                await _finish_run(db_run.id, str(e))
+
+    async def _check_submitted(self) -> None:
+        async with SessionLocal() as db:
+            db_runs = await run_crud.get_submitted_batch_runs(db)
+        for db_run in db_runs:
+            try:
+                state = await self.backend.poll(db_run.batch_id)
+                if not state.done:
+                    continue
+                missing = await ingest_batch_run(self.backend, db_run)
+            except Exception:
+                # Polled again on the next pass
+                logger.exception("Checking batch of run %s failed", db_run.id)
+                continue
+            error = state.error
+            if error is None and missing:
+                error = f"{missing} test cases missing from the batch results"
+            await _finish_run(db_run.id, error)
+            logger.info("Ingested batch %s of run %s", db_run.batch_id, db_run.id)
+
+    async def _loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Batch poll failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+batch_poller = BatchPoller()
@@ -0,0 +1,186 @@
+"""
+Backends that batch runs submit their JSONL batch files to.
+
+A batch file has one chat completions request per line, in the format of the
+OpenAI Batch API:
+
+    {"custom_id": "...", "method": "POST", "url": "/chat/completions",
+     "body": {...}}
+
+and its results come back as one line per request holding either the
+`response` (status code and completion body) or an `error`.
+
+BATCH_BACKEND picks the backend: "azure" submits to the Azure OpenAI Batch API,
+"local" is a file-based stand-in that runs the requests itself, for tests and
+development.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+from openai import OpenAIError
+
+from utils import llm
+
+load_dotenv()
+
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "azure")
+# Deployment the batch requests are sent to; Azure only runs batches on
+# deployments of the global batch type
+BATCH_DEPLOYMENT_NAME = os.getenv(
+    "AZURE_OPENAI_BATCH_DEPLOYMENT_NAME", llm.deployment_name
+)
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+BATCH_DIR = os.getenv("BATCH_DIR", "batches")
+# Requests the local backend has in flight at a time
+LOCAL_BATCH_CONCURRENCY = 8
+
+BATCH_ENDPOINT = "/chat/completions"
+
+# Azure batch statuses after which the batch will not change any more
+_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class BatchState:
+    done: bool
+    # Why a finished batch did not complete; its partial results may still
+    # be available
+    error: Optional[str] = None
+
+
+class BatchBackend(ABC):
+    @abstractmethod
+    async def submit(self, path: str) -> str:
+        """
+        Submit the batch file at `path` and return the batch id.
+        """
+
+    @abstractmethod
+    async def poll(self, batch_id: str) -> BatchState: ...
+
+    @abstractmethod
+    def results(self, batch_id: str) -> AsyncIterator[dict]:
+        """
+        The result lines of a finished batch, failed requests included.
+        """
+
+
+class AzureBatchBackend(BatchBackend):
+    """
+    Azure OpenAI Batch API: the file is uploaded, processed within
+    BATCH_COMPLETION_WINDOW outside the deployment's rate limits, and the
+    results are downloaded from its output and error files.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or llm.client
+
+    async def submit(self, path: str) -> str:
+        with open(path, "rb") as batch_file:
+            uploaded = await self.client.files.create(file=batch_file, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> BatchState:
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status not in _FINAL_STATUSES:
+            return BatchState(done=False)
+        if batch.status == "completed":
+            return BatchState(done=True)
+        error = f"Batch {batch.status}"
+        if batch.errors and batch.errors.data:
+            error += f": {batch.errors.data[0].message}"
+        return BatchState(done=True, error=error)
+
+    async def results(self, batch_id: str) -> AsyncIterator[dict]:
+        batch = await self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            # Only "\n" ends a line; U+2028 and the like may occur in outputs
+            for line in content.text.split("\n"):
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the Batch API. A submitted batch is copied to its
+    own directory under `root`; the first poll runs its requests through the
+    chat completions client and writes the results next to it.
+    """
+
+    def __init__(self, root: str = BATCH_DIR, client=None):
+        self.root = root
+        self.client = client
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.root, batch_id, name)
+
+    async def submit(self, path: str) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.root, batch_id))
+        shutil.copyfile(path, self._path(batch_id, "input.jsonl"))
+        return batch_id
+
+    async def poll(self, batch_id: str) -> BatchState:
+        if not os.path.exists(self._path(batch_id, "input.jsonl")):
+            return BatchState(done=True, error="Batch not found")
+        if not os.path.exists(self._path(batch_id, "output.jsonl")):
+            await self._process(batch_id)
+        return BatchState(done=True)
+
+    async def results(self, batch_id: str) -> AsyncIterator[dict]:
+        with open(self._path(batch_id, "output.jsonl"), encoding="utf-8") as output:
+            for line in output:
+                yield json.loads(line)
+
+    async def _process(self, batch_id: str) -> None:
+        client = self.client or llm.client
+        semaphore = asyncio.Semaphore(LOCAL_BATCH_CONCURRENCY)
+
+        async def run(request: dict) -> dict:
+            async with semaphore:
+                try:
+                    completion = await client.chat.completions.create(**request["body"])
+                except OpenAIError as e:
+                    return {
+                        "custom_id": request["custom_id"],
+                        "response": None,
+                        "error": {"code": type(e).__name__, "message": str(e)},
+                    }
+            return {
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": completion.model_dump()},
+                "error": None,
+            }
+
+        with open(self._path(batch_id, "input.jsonl"), encoding="utf-8") as batch:
+            requests = [json.loads(line) for line in batch if line.strip()]
+        results = await asyncio.gather(*(run(request) for request in requests))
+
+        partial_path = self._path(batch_id, "output.jsonl.partial")
+        with open(partial_path, "w", encoding="utf-8") as output:
+            for result in results:
+                output.write(json.dumps(result) + "\n")
+        os.replace(partial_path, self._path(batch_id, "output.jsonl"))
+
+
+def get_batch_backend(name: str = BATCH_BACKEND) -> BatchBackend:
+    if name == "azure":
+        return AzureBatchBackend()
+    if name == "local":
+        return LocalBatchBackend()
+    raise ValueError(f"Unknown batch backend: {name}")
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from crud import completion_cache as completion_cache_crud
+
+load_dotenv()
+
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "10000"))
+COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", "86400"))
+COMPLETION_CACHE_DB = os.getenv("COMPLETION_CACHE_DB", "false").lower() == "true"
+
+
+class LRUCache:
+    """
+    Bounded in-memory cache with least-recently-used eviction and a per-entry
+    time to live. Not shared between processes.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class CompletionCache(ABC):
+    """
+    Interface for completion cache tiers. Keys come from `completion_key`.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def set(self, key: str, output: str) -> None: ...
+
+
+class MemoryCompletionCache(CompletionCache):
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self._lru = LRUCache(maxsize, ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._lru.get(key)
+
+    async def set(self, key: str, output: str) -> None:
+        self._lru.set(key, output)
+
+
+class DBCompletionCache(CompletionCache):
+    """
+    Completion cache stored in the `completion_cache` table, shared by every
+    worker. Each lookup uses its own short-lived session.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        async with SessionLocal() as db:
+            entry = await completion_cache_crud.get_completion(db, key, ttl=self.ttl)
+            return entry.output if entry else None
+
+    async def set(self, key: str, output: str) -> None:
+        async with SessionLocal() as db:
+            await completion_cache_crud.set_completion(db, key, output)
+
+
+class TieredCompletionCache(CompletionCache):
+    """
+    Checks each tier in order and back-fills the faster tiers on a hit.
+    """
+
+    def __init__(self, tiers: List[CompletionCache]):
+        self.tiers = tiers
+
+    async def get(self, key: str) -> Optional[str]:
+        for i, tier in enumerate(self.tiers):
+            output = await tier.get(key)
+            if output is not None:
+                for faster in self.tiers[:i]:
+                    await faster.set(key, output)
+                return output
+        return None
+
+    async def set(self, key: str, output: str) -> None:
+        for tier in self.tiers:
+            await tier.set(key, output)
+
+
+def completion_key(
+    deployment: str, system_prompt: str, user_message: str, **params: Any
+) -> str:
+    """
+    Build a cache key from everything that determines a completion.
+    """
+    payload = json.dumps(
+        {
+            "deployment": deployment,
+            "system_prompt": system_prompt,
+            "user_message": user_message,
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_completion_cache() -> CompletionCache:
+    tiers: List[CompletionCache] = [
+        MemoryCompletionCache(COMPLETION_CACHE_SIZE, COMPLETION_CACHE_TTL)
+    ]
+    if COMPLETION_CACHE_DB:
+        tiers.append(DBCompletionCache(COMPLETION_CACHE_TTL))
+    return TieredCompletionCache(tiers)
+
+
+completion_cache = build_completion_cache()
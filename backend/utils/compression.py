@@ -0,0 +1,152 @@
+"""
+Negotiated response compression.
+
+`CompressionMiddleware` compresses response bodies with brotli or gzip,
+whichever the client ranks higher in `Accept-Encoding` (brotli on a tie).
+Bodies smaller than COMPRESSION_MINIMUM_SIZE are sent as is. Streamed
+responses (SSE runs, exports) are compressed chunk by chunk and flushed after
+each chunk, so clients still receive every event as soon as it is produced.
+"""
+
+import os
+import zlib
+from typing import Optional
+
+import brotli
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+from utils.metrics import stage
+
+load_dotenv()
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# 0-11; the high qualities are meant for static assets, not per-request bodies
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# In order of preference
+ENCODINGS = ("br", "gzip")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the supported encoding the client prefers, or None for identity.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    default = weights.get("*", 0.0)
+    best = max(ENCODINGS, key=lambda encoding: weights.get(encoding, default))
+    return best if weights.get(best, default) > 0 else None
+
+
+class Compressor:
+    """
+    Incremental brotli or gzip compressor.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(
+                COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        """
+        Compress `data` and flush it, ending the stream if `finish`.
+        """
+        if self.encoding == "br":
+            compressed = self._compressor.process(data)
+            tail = self._compressor.finish() if finish else self._compressor.flush()
+            return compressed + tail
+        mode = zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+class _CompressingSend:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor: Optional[Compressor] = None
+
+    def _should_compress(self, status: int, headers: Headers, body, more_body) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        start_message, self.start_message = self.start_message, None
+        if start_message is not None:
+            headers = MutableHeaders(raw=list(start_message["headers"]))
+            if self._should_compress(start_message["status"], headers, body, more_body):
+                self.compressor = Compressor(self.encoding)
+                headers["Content-Encoding"] = self.encoding
+                headers.add_vary_header("Accept-Encoding")
+                # The compressed bytes differ per encoding, so the tag is weak
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+            if self.compressor is not None:
+                with stage("serialization"):
+                    body = self.compressor.compress(body, finish=not more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(body))
+            await self.send({**start_message, "headers": headers.raw})
+        elif self.compressor is not None:
+            with stage("serialization"):
+                body = self.compressor.compress(body, finish=not more_body)
+
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing HTTP responses the client accepts compressed.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(
+            scope, receive, _CompressingSend(send, encoding, self.minimum_size)
+        )
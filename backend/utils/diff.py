@@ -0,0 +1,254 @@
+"""
+Word-level diffs of the outputs of two versions.
+
+The latest output of each test case under one version is paired with its
+latest output under the other. Diffing hundreds of long outputs is CPU-bound,
+so the pairs are diffed in batches on a process pool of DIFF_WORKERS processes
+instead of the event loop. Finished diffs are kept in an LRU cache keyed by the
+version pair and the run logs compared, so repeated views are served from
+memory until either version gets newer outputs.
+
+The same word-level similarity measures how much the samples of a test case
+drawn in one multi-sample run differ from each other.
+"""
+
+import asyncio
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import run_log as run_log_crud
+from schemas.run import RunTestCase, TestCaseVariance
+from schemas.version import DiffSegment, TestCaseDiff, VersionDiff
+from utils.cache import LRUCache
+
+load_dotenv()
+
+# 0 uses one process per CPU
+DIFF_WORKERS = int(os.getenv("DIFF_WORKERS", "0")) or os.cpu_count()
+DIFF_CACHE_SIZE = int(os.getenv("DIFF_CACHE_SIZE", "128"))
+# Output pairs sent to a worker at a time
+DIFF_BATCH_SIZE = 16
+
+# A word with the whitespace after it (or leading whitespace on its own), so
+# the tokens of a text join back into it
+TOKEN = re.compile(r"\S+\s*|\s+")
+
+Segment = Tuple[str, str]
+
+_executor: Optional[ProcessPoolExecutor] = None
+diff_cache = LRUCache(DIFF_CACHE_SIZE)
+
+
+def _append(segments: List[Segment], op: str, text: str) -> None:
+    if segments and segments[-1][0] == op:
+        segments[-1] = (op, segments[-1][1] + text)
+    else:
+        segments.append((op, text))
+
+
+def _word_matcher(old_tokens: List[str], new_tokens: List[str]) -> SequenceMatcher:
+    return SequenceMatcher(
+        None,
+        [token.strip() for token in old_tokens],
+        [token.strip() for token in new_tokens],
+        autojunk=False,
+    )
+
+
+def diff_words(old: str, new: str) -> Tuple[float, List[Segment]]:
+    """
+    Diff two texts word by word, ignoring changes in the whitespace between
+    words. Returns the similarity ratio (1.0 when identical) and the
+    (op, text) segments, op being "equal", "delete" or "insert", that turn
+    `old` into `new`.
+    """
+    old_tokens = TOKEN.findall(old)
+    new_tokens = TOKEN.findall(new)
+    matcher = _word_matcher(old_tokens, new_tokens)
+    segments: List[Segment] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            _append(segments, "equal", "".join(new_tokens[j1:j2]))
+            continue
+        if i2 > i1:
+            _append(segments, "delete", "".join(old_tokens[i1:i2]))
+        if j2 > j1:
+            _append(segments, "insert", "".join(new_tokens[j1:j2]))
+    return matcher.ratio(), segments
+
+
+def word_similarity(old: str, new: str) -> float:
+    """
+    The similarity ratio of `diff_words`, without building the segments.
+    """
+    return _word_matcher(TOKEN.findall(old), TOKEN.findall(new)).ratio()
+
+
+def diff_batch(pairs: List[Tuple[str, str]]) -> List[Tuple[float, List[Segment]]]:
+    return [diff_words(old, new) for old, new in pairs]
+
+
+def similarity_batch(pairs: List[Tuple[str, str]]) -> List[float]:
+    return [word_similarity(old, new) for old, new in pairs]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=DIFF_WORKERS)
+    return _executor
+
+
+async def _map_batches(batch_fn: Callable, pairs: List[Tuple[str, str]]) -> list:
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    batches = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                executor, batch_fn, pairs[start : start + DIFF_BATCH_SIZE]
+            )
+            for start in range(0, len(pairs), DIFF_BATCH_SIZE)
+        )
+    )
+    return [result for batch in batches for result in batch]
+
+
+async def diff_pairs(pairs: List[Tuple[str, str]]) -> List[Tuple[float, List[Segment]]]:
+    """
+    Diff (old, new) text pairs on the process pool.
+    """
+    return await _map_batches(diff_batch, pairs)
+
+
+async def similarity_pairs(pairs: List[Tuple[str, str]]) -> List[float]:
+    """
+    Word-level similarity of (old, new) text pairs on the process pool.
+    """
+    return await _map_batches(similarity_batch, pairs)
+
+
+def shutdown_diff_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def diff_versions(
+    db: AsyncSession, from_version_id: int, to_version_id: int
+) -> VersionDiff:
+    """
+    Diff the latest output of every test case run under both versions.
+    """
+    from_logs = {
+        row.test_case_id: row
+        for row in await run_log_crud.get_latest_version_run_logs(db, from_version_id)
+    }
+    to_logs = {
+        row.test_case_id: row
+        for row in await run_log_crud.get_latest_version_run_logs(db, to_version_id)
+    }
+    key = (
+        from_version_id,
+        to_version_id,
+        tuple((row.test_case_id, row.id) for row in from_logs.values()),
+        tuple((row.test_case_id, row.id) for row in to_logs.values()),
+    )
+    cached = diff_cache.get(key)
+    if cached is not None:
+        return cached
+
+    paired = sorted(from_logs.keys() & to_logs.keys())
+    outputs = await run_log_crud.get_run_log_outputs(
+        db,
+        [from_logs[test_case_id].id for test_case_id in paired]
+        + [to_logs[test_case_id].id for test_case_id in paired],
+    )
+    old_outputs = [outputs[from_logs[test_case_id].id] for test_case_id in paired]
+    new_outputs = [outputs[to_logs[test_case_id].id] for test_case_id in paired]
+    diffs = await diff_pairs(
+        [
+            (old.response or "", new.response or "")
+            for old, new in zip(old_outputs, new_outputs)
+        ]
+    )
+
+    test_cases = [
+        TestCaseDiff(
+            test_case_id=test_case_id,
+            user_message=new.user_message,
+            from_run_id=from_logs[test_case_id].run_id,
+            to_run_id=to_logs[test_case_id].run_id,
+            from_error=old.error,
+            to_error=new.error,
+            similarity=similarity,
+            segments=[DiffSegment(op=op, text=text) for op, text in segments],
+        )
+        for test_case_id, old, new, (similarity, segments) in zip(
+            paired, old_outputs, new_outputs, diffs
+        )
+    ]
+    version_diff = VersionDiff(
+        from_version_id=from_version_id,
+        to_version_id=to_version_id,
+        similarity=(
+            sum(diff.similarity for diff in test_cases) / len(test_cases)
+            if test_cases
+            else None
+        ),
+        changed=sum(diff.similarity < 1 for diff in test_cases),
+        test_cases=test_cases,
+        unpaired_test_case_ids=sorted(from_logs.keys() ^ to_logs.keys()),
+    )
+    diff_cache.set(key, version_diff)
+    return version_diff
+
+
+async def output_variance(results: List[RunTestCase]) -> List[TestCaseVariance]:
+    """
+    Summarise how much the samples of each test case differ: the number of
+    distinct outputs and the mean word-level similarity over every pair of
+    successful samples (None with fewer than two).
+    """
+    outputs: Dict[int, List[str]] = defaultdict(list)
+    errors: Dict[int, int] = defaultdict(int)
+    samples: Dict[int, int] = defaultdict(int)
+    for result in results:
+        if result.test_case_id is None:
+            continue
+        samples[result.test_case_id] += 1
+        if result.error:
+            errors[result.test_case_id] += 1
+        else:
+            outputs[result.test_case_id].append(result.output)
+
+    test_case_ids = sorted(samples)
+    pairs = {
+        test_case_id: list(combinations(outputs[test_case_id], 2))
+        for test_case_id in test_case_ids
+    }
+    similarities = iter(
+        await similarity_pairs(
+            [pair for test_case_id in test_case_ids for pair in pairs[test_case_id]]
+        )
+    )
+    variance = []
+    for test_case_id in test_case_ids:
+        scores = [next(similarities) for _ in pairs[test_case_id]]
+        variance.append(
+            TestCaseVariance(
+                test_case_id=test_case_id,
+                samples=samples[test_case_id],
+                errors=errors[test_case_id],
+                distinct_outputs=len(set(outputs[test_case_id])),
+                mean_similarity=sum(scores) / len(scores) if scores else None,
+            )
+        )
+    return variance
@@ -0,0 +1,87 @@
+"""
+Conditional GETs for reads scoped to a prompt.
+
+Every change to a prompt, its test cases or its versions bumps
+`Prompt.revision` in the same transaction. The ETag of such a read combines
+that revision with the request's path and query (so every page and format has
+its own tag). A request whose `If-None-Match` still matches gets an empty 304
+after a single primary-key lookup, without querying or serializing the
+collection. Authenticated reads only tag prompts the current user owns, so a
+304 never reveals another user's prompt.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import prompt as prompt_crud
+from database import get_read_db
+from models.user import User
+from utils.auth import get_current_user
+
+# Browsers may keep the response, but must revalidate it before every reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(request: Request, revision: int) -> str:
+    target = f"{request.url.path}?{request.url.query}"
+    digest = hashlib.sha256(target.encode("utf-8")).hexdigest()[:16]
+    return f'"{revision}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`, using the weak comparison
+    RFC 9110 prescribes for it.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _check_etag(request: Request, response: Response, revision: Optional[int]):
+    if revision is None:
+        return
+    etag = make_etag(request, revision)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+async def prompt_etag(
+    prompt_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+) -> None:
+    """
+    Route dependency answering 304 Not Modified when the client's copy of a
+    read of prompt `prompt_id` is current, and tagging the response otherwise.
+    Unknown prompts are left to the route. For unauthenticated routes only;
+    see `user_prompt_etag`.
+    """
+    _check_etag(request, response, await prompt_crud.get_prompt_revision(db, prompt_id))
+
+
+async def user_prompt_etag(
+    prompt_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+) -> None:
+    """
+    `prompt_etag` for authenticated routes: prompts the current user doesn't
+    own are left untagged, for the route to reject.
+    """
+    _check_etag(
+        request,
+        response,
+        await prompt_crud.get_prompt_revision(db, prompt_id, user_id=current_user.id),
+    )
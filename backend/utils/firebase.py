@@ -1,7 +1,6 @@
 import firebase_admin
 from firebase_admin import credentials, auth
 from fastapi import HTTPException, status
-from typing import Optional
 import os
 from dotenv import load_dotenv
 
@@ -29,13 +28,12 @@ cred = credentials.Certificate(
 firebase_admin.initialize_app(cred)
 
 
-async def verify_firebase_token(token: str) -> Optional[str]:
+async def decode_firebase_token(token: str) -> dict:
     """
-    Verify the Firebase ID token and return the user ID if valid.
+    Verify the Firebase ID token and return its decoded claims if valid.
     """
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token["uid"]
+        return auth.verify_id_token(token)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
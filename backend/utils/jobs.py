@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import SessionLocal
+from crud import run as run_crud
+from crud import test_case as test_case_crud
+from models.run import Run
+from models.test_case import TestCase
+from utils.llm import SamplingParams
+from utils.runner import stream_run
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Number of job runs executed concurrently by this process
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "2"))
+# How often idle workers check the queue for runs submitted by other processes
+RUN_POLL_INTERVAL = float(os.getenv("RUN_POLL_INTERVAL", "2.0"))
+
+
+def run_sampling_params(db_run: Run) -> SamplingParams:
+    return SamplingParams(
+        temperature=db_run.temperature,
+        top_p=db_run.top_p,
+        max_tokens=db_run.max_tokens,
+        seed=db_run.seed,
+    )
+
+
+async def pending_test_cases(db: AsyncSession, db_run: Run) -> List[TestCase]:
+    """
+    The test cases of a run that have no run log yet: those its sample
+    selected when it was created, or all of the prompt's.
+    """
+    completed_ids = await run_crud.get_completed_test_case_ids(db, db_run.id)
+    if db_run.sample_fraction is not None:
+        test_cases = await run_crud.get_run_test_cases(db, db_run.id)
+    else:
+        test_cases = await test_case_crud.get_test_cases_by_prompt(db, db_run.prompt_id)
+    return [tc for tc in test_cases if tc.id not in completed_ids]
+
+
+async def _claim_next_run() -> Optional[dict]:
+    async with SessionLocal() as db:
+        db_run = await run_crud.claim_next_run(db)
+        if db_run is None:
+            return None
+        return {
+            "run_id": db_run.id,
+            "user_id": db_run.user_id,
+            "prompt_id": db_run.prompt_id,
+            "system_prompt": db_run.system_prompt.content,
+            "test_cases": await pending_test_cases(db, db_run),
+            "max_concurrency": db_run.max_concurrency,
+            "bypass_cache": db_run.bypass_cache,
+            "params": run_sampling_params(db_run),
+            "samples": db_run.samples_per_case,
+        }
+
+
+async def _finish_run(run_id: int, error: Optional[str] = None) -> None:
+    async with SessionLocal() as db:
+        await run_crud.finish_run(db, run_id, error=error)
+
+
+async def _requeue_interrupted_runs() -> int:
+    async with SessionLocal() as db:
+        return await run_crud.requeue_interrupted_runs(db)
+
+
+async def execute_job(job: dict) -> None:
+    """
+    Run every test case of a claimed job (or of its sample) that has no run
+    log yet, so a job interrupted by a restart resumes where it stopped and a
+    completed sample is extended to the full run.
+    """
+    try:
+        async for _ in stream_run(**job):
+            pass
+    except Exception as e:
+        logger.exception("Run %s failed", job["run_id"])
+        await _finish_run(job["run_id"], str(e))
+        return
+    await _finish_run(job["run_id"])
+
+
+class RunWorkerPool:
+    """
+    Bounded pool of asyncio workers consuming queued job runs from the `runs`
+    table. The queue lives in the database, so queued and interrupted runs are
+    picked up again after a restart.
+    """
+
+    def __init__(
+        self, size: int = RUN_WORKERS, poll_interval: float = RUN_POLL_INTERVAL
+    ):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        requeued = await _requeue_interrupted_runs()
+        if requeued:
+            logger.info("Requeued %s interrupted runs", requeued)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.size)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """
+        Wake idle workers after a run has been queued.
+        """
+        self._wakeup.set()
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await _claim_next_run()
+            except Exception:
+                logger.exception("Failed to claim a queued run")
+                job = None
+
+            if job is not None:
+                await execute_job(job)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+run_worker_pool = RunWorkerPool()
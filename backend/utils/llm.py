@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+from openai import (
+    AsyncAzureOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from dotenv import load_dotenv
+
+from utils.cache import completion_cache, completion_key
+from utils.metrics import (
+    llm_cache_lookups,
+    llm_request_duration,
+    llm_requests,
+    stage,
+)
+from utils.rate_limit import (
+    RateLimiter,
+    backoff_seconds,
+    estimate_tokens,
+    retry_after_seconds,
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Initialize Azure OpenAI client. Retries are handled by `_create_completion`
+# so they go through the rate limiter.
+client = AsyncAzureOpenAI(
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+    max_retries=0,
+)
+
+deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+if not deployment_name:
+    raise RuntimeError("AZURE_OPENAI_DEPLOYMENT_NAME is missing.")
+
+# Maximum number of completion calls in flight across the whole process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Deployment quota; 0 disables the corresponding limit
+LLM_RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "0"))
+LLM_TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "0"))
+# Completion tokens reserved per call until the actual usage is known
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "256"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60.0"))
+
+RETRYABLE_ERRORS = (
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
+
+_process_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+rate_limiter = RateLimiter(rpm=LLM_RPM_LIMIT, tpm=LLM_TPM_LIMIT)
+
+
+@dataclass(frozen=True)
+class SamplingParams:
+    """
+    Sampling parameters of a completion call; unset ones use the API default.
+    """
+
+    temperature: float = 0.7
+    top_p: Optional[float] = None
+    max_tokens: Optional[int] = None
+    seed: Optional[int] = None
+
+    def api_kwargs(self) -> dict:
+        return {
+            name: value for name, value in asdict(self).items() if value is not None
+        }
+
+
+DEFAULT_SAMPLING = SamplingParams()
+
+
+@dataclass
+class Completion:
+    output: str
+    cached: bool = False
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    latency_ms: Optional[float] = None
+    finish_reason: Optional[str] = None
+
+
+async def _create_completion(reserved_tokens: int, **kwargs) -> Tuple[object, float]:
+    """
+    Call the chat completions API within the RPM/TPM budget, retrying 429s,
+    timeouts, connection errors and 5xx responses. 429 `Retry-After` delays are
+    honoured and pause every caller; otherwise retries back off exponentially
+    with jitter.
+
+    Returns the response and the latency of the successful call in seconds.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await rate_limiter.acquire(reserved_tokens)
+        try:
+            async with _process_semaphore:
+                started = time.perf_counter()
+                with stage("llm"):
+                    response = await client.chat.completions.create(**kwargs)
+                latency = time.perf_counter() - started
+                llm_request_duration.observe(latency)
+        except RETRYABLE_ERRORS as e:
+            llm_requests.inc(
+                "rate_limited" if isinstance(e, RateLimitError) else "error"
+            )
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            response_headers = getattr(getattr(e, "response", None), "headers", None)
+            delay = retry_after_seconds(response_headers)
+            if delay is None:
+                delay = backoff_seconds(attempt, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+            if isinstance(e, RateLimitError):
+                rate_limiter.block_for(delay)
+            await asyncio.sleep(delay)
+            continue
+        except Exception:
+            llm_requests.inc("error")
+            raise
+
+        llm_requests.inc("success")
+        if response.usage is not None:
+            rate_limiter.record_usage(reserved_tokens, response.usage.total_tokens)
+        return response, latency
+
+
+def _sample_key(system_prompt: str, user_message: str, params: dict, index: int):
+    # Sample 0 keeps the key of a single completion
+    if index:
+        params = {**params, "sample": index}
+    return completion_key(deployment_name, system_prompt, user_message, **params)
+
+
+def request_body(
+    system_prompt: str,
+    user_message: str,
+    params: SamplingParams = DEFAULT_SAMPLING,
+    n: int = 1,
+    model: Optional[str] = None,
+) -> dict:
+    """
+    The chat completions request for `n` samples of a test case.
+    """
+    body = {
+        "model": model or deployment_name,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message},
+        ],
+        **params.api_kwargs(),
+    }
+    if n > 1:
+        body["n"] = n
+    return body
+
+
+async def cached_completions(
+    system_prompt: str,
+    user_message: str,
+    params: SamplingParams = DEFAULT_SAMPLING,
+    n: int = 1,
+) -> List[Optional[Completion]]:
+    """
+    Look up each of the `n` samples of a request in the completion cache; a
+    missing sample is None.
+    """
+    api_params = params.api_kwargs()
+    completions: List[Optional[Completion]] = []
+    for i in range(n):
+        output = await completion_cache.get(
+            _sample_key(system_prompt, user_message, api_params, i)
+        )
+        llm_cache_lookups.inc("miss" if output is None else "hit")
+        completions.append(
+            None if output is None else Completion(output=output, cached=True)
+        )
+    return completions
+
+
+async def store_completions(
+    system_prompt: str,
+    user_message: str,
+    params: SamplingParams,
+    sample_indices: List[int],
+    response,
+    latency: Optional[float] = None,
+) -> List[Completion]:
+    """
+    Cache the choices of a completions response as the samples
+    `sample_indices` of the request and return them; a failed cache write is
+    logged and does not fail the completion. The call's prompt tokens
+    are attributed to its first sample and its completion tokens are split
+    evenly between its samples.
+    """
+    api_params = params.api_kwargs()
+    usage = response.usage
+    choices = sorted(response.choices, key=lambda choice: choice.index)
+    if len(choices) < len(sample_indices):
+        raise RuntimeError(
+            f"Requested {len(sample_indices)} completions, received {len(choices)}"
+        )
+    completions = []
+    for position, (i, choice) in enumerate(zip(sample_indices, choices)):
+        # No content, e.g. with finish reason "content_filter"; kept as an
+        # empty output with its finish reason, but not cached
+        output = (choice.message.content or "").strip()
+        try:
+            if choice.message.content is not None:
+                await completion_cache.set(
+                    _sample_key(system_prompt, user_message, api_params, i), output
+                )
+        except Exception:
+            # The completion is already paid for; only its reuse is lost
+            logger.exception("Failed to cache a completion")
+        prompt_tokens = completion_tokens = None
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens if position == 0 else None
+            completion_tokens = usage.completion_tokens // len(choices)
+            if position == 0:
+                completion_tokens += usage.completion_tokens % len(choices)
+        completions.append(
+            Completion(
+                output=output,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                latency_ms=latency * 1000 if latency is not None else None,
+                finish_reason=choice.finish_reason,
+            )
+        )
+    return completions
+
+
+async def complete(
+    system_prompt: str,
+    user_message: str,
+    bypass_cache: bool = False,
+    params: SamplingParams = DEFAULT_SAMPLING,
+    n: int = 1,
+) -> List[Completion]:
+    """
+    Sample `n` chat completions of one request and return their stripped
+    output texts along with the call's token usage, latency and finish
+    reasons.
+
+    Every sample is cached on its own. Only the samples missing from the
+    completion cache are requested, all in a single call using the API's `n`
+    parameter, so the prompt is sent (and billed) once. With `bypass_cache`
+    the cache is not read, but the fresh outputs are still stored. Waits for a
+    free slot in the process-wide concurrency pool before calling the model.
+    """
+    completions: List[Optional[Completion]] = [None] * n
+    if not bypass_cache:
+        completions = await cached_completions(system_prompt, user_message, params, n)
+    missing = [i for i, completion in enumerate(completions) if completion is None]
+    if not missing:
+        return completions
+
+    completion_budget = params.max_tokens or LLM_COMPLETION_TOKEN_ESTIMATE
+    response, latency = await _create_completion(
+        estimate_tokens(system_prompt, user_message) + completion_budget * len(missing),
+        **request_body(system_prompt, user_message, params, len(missing)),
+    )
+    fresh = await store_completions(
+        system_prompt, user_message, params, missing, response, latency
+    )
+    for i, completion in zip(missing, fresh):
+        completions[i] = completion
+    return completions
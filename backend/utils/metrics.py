@@ -0,0 +1,268 @@
+"""
+In-process metrics exposed in the Prometheus text format at `/metrics`.
+
+Requests are timed by `MetricsMiddleware`, which also tracks how long each
+request spent in the auth, db, llm and serialization stages. Code reports stage
+time with `stage(...)`; time spent in concurrent calls (e.g. the model calls of
+a run) adds up, so a stage total can exceed the request's wall-clock time.
+"""
+
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+STAGES = ("auth", "db", "llm", "serialization")
+
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_stages", default=None
+)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + inner + "}"
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    @abstractmethod
+    def _samples(self): ...
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _samples(self):
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                label_str = _format_labels(self.label_names, labels, [("le", le)])
+                yield f"{self.name}_bucket{label_str} {cumulative}"
+            label_str = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{label_str} {series[-1]}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ("method", "route", "status"),
+    )
+)
+http_request_stage_duration = registry.register(
+    Histogram(
+        "http_request_stage_duration_seconds",
+        "Time each HTTP request spent per stage (auth, db, llm, serialization).",
+        ("route", "stage"),
+    )
+)
+http_requests_in_progress = registry.register(
+    Gauge("http_requests_in_progress", "HTTP requests currently being served.")
+)
+runs_in_progress = registry.register(
+    Gauge("runs_in_progress", "Runs currently executing test cases.")
+)
+llm_requests = registry.register(
+    Counter(
+        "llm_requests_total",
+        "Completion API calls by outcome (success, rate_limited, error).",
+        ("outcome",),
+    )
+)
+llm_request_duration = registry.register(
+    Histogram("llm_request_duration_seconds", "Completion API call latency.")
+)
+llm_cache_lookups = registry.register(
+    Counter(
+        "llm_cache_lookups_total", "Completion cache lookups by result.", ("result",)
+    )
+)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Attribute the time spent in the block to a stage of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Attribute time spent executing SQL on `engine` to the db stage.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        started = conn.info["query_started_at"].pop()
+        record_stage("db", time.perf_counter() - started)
+
+
+class TimedJSONResponse(ORJSONResponse):
+    """
+    orjson-rendered JSON response that attributes body rendering to the
+    serialization stage.
+    """
+
+    def render(self, content) -> bytes:
+        with stage("serialization"):
+            return super().render(content)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and per-stage time for each HTTP request,
+    labelled with the matched route template rather than the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_progress.dec()
+            _request_stages.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            http_request_duration.observe(
+                elapsed, scope["method"], route_path, str(status["code"])
+            )
+            for name in STAGES:
+                http_request_stage_duration.observe(
+                    stages.get(name, 0.0), route_path, name
+                )
@@ -0,0 +1,64 @@
+import base64
+import json
+from typing import Any, Callable, List, Optional, Tuple
+from fastapi import HTTPException, Query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class PageParams:
+    """
+    Dependency reading the `cursor` and `limit` query parameters of a keyset
+    paginated list endpoint.
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(
+            None, description="`next_cursor` from the previous page"
+        ),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    ):
+        self.after = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+
+
+def encode_cursor(key: Tuple[Any, ...]) -> str:
+    payload = json.dumps(list(key), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def paginate(rows: list, limit: int, key: Callable[[Any], Tuple[Any, ...]]) -> dict:
+    """
+    Build a page from up to `limit + 1` rows fetched in sort-key order; the
+    extra row only signals that another page exists.
+    """
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def cursor_key(after: Optional[List[Any]], *types: Callable[[Any], Any]):
+    """
+    Convert a decoded cursor into a typed sort key, e.g.
+    `cursor_key(params.after, datetime.fromisoformat, int)`.
+    """
+    if after is None:
+        return None
+    if len(after) != len(types):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return tuple(convert(value) for convert, value in zip(types, after))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
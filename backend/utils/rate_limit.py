@@ -0,0 +1,128 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute, with
+    a burst capacity of one minute's budget. A budget of 0 disables the limit.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._tokens = per_minute
+        self._updated_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` tokens are available. Requests larger than the
+        capacity only wait for a full bucket.
+        """
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        needed = min(amount, self.capacity)
+        if self._tokens >= needed:
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """
+        Take `amount` tokens. Negative amounts return tokens; the balance may go
+        negative when actual usage exceeds what was reserved.
+        """
+        if self.enabled:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets for one deployment.
+
+    `acquire` waits until both budgets allow the call and any server-imposed
+    pause (from a 429 `Retry-After`) has elapsed. Waiters are served in order.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float) -> None:
+        async with self._lock:
+            while True:
+                delay = max(
+                    self._blocked_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+
+    def record_usage(self, reserved: float, actual: float) -> None:
+        """
+        Correct the token budget once the actual usage of a call is known.
+        """
+        self.tokens.consume(actual - reserved)
+
+    def block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    Parse the server-requested delay from `retry-after-ms` or `retry-after`.
+    """
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def backoff_seconds(attempt: int, base: float, cap: float) -> float:
+    """
+    Exponential backoff with full jitter for the given retry attempt (0-based).
+    """
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+def estimate_tokens(*texts: str) -> int:
+    """
+    Rough token count for budgeting (about four characters per token).
+    """
+    return sum(len(text) for text in texts) // 4 + 1
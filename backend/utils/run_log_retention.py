@@ -0,0 +1,276 @@
+"""
+Monthly partitions, daily rollups and archival of run logs.
+
+On Postgres `run_logs` is range-partitioned by month on `created_at` into
+`run_logs_YYYY_MM` tables, with `run_logs_default` catching anything outside
+them. `RunLogMaintenance` periodically:
+
+- creates the partitions for the current and next RUN_LOG_PARTITIONS_AHEAD
+  months, so inserts never land in the default partition;
+- refreshes the daily per-prompt rollups of the days since the last pass;
+- archives months older than RUN_LOG_RETENTION_MONTHS: their rollups are
+  refreshed, their rows are written to a gzipped CSV in RUN_LOG_ARCHIVE_DIR
+  and the partition is dropped.
+
+SQLite has no partitions; expired months are archived the same way and then
+deleted. Run a single pass by hand with `python -m utils.run_log_retention`.
+"""
+
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, engine
+from crud import run_log_rollup as rollup_crud
+from models.run_log import RunLog
+from models.run_log_rollup import RunLogDailyRollup
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Whole months of run logs kept in the database; 0 keeps everything
+RUN_LOG_RETENTION_MONTHS = int(os.getenv("RUN_LOG_RETENTION_MONTHS", "6"))
+RUN_LOG_ARCHIVE_DIR = os.getenv("RUN_LOG_ARCHIVE_DIR", "archive/run_logs")
+RUN_LOG_PARTITIONS_AHEAD = int(os.getenv("RUN_LOG_PARTITIONS_AHEAD", "2"))
+# Seconds between maintenance passes; 0 disables the background task
+RUN_LOG_MAINTENANCE_INTERVAL = float(os.getenv("RUN_LOG_MAINTENANCE_INTERVAL", "3600"))
+
+ARCHIVE_CHUNK_SIZE = 1000
+# Postgres advisory lock held during a pass, so only one process maintains
+_ADVISORY_LOCK_KEY = 72836140
+
+PARTITION_NAME = re.compile(r"^run_logs_(\d{4})_(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"run_logs_{month:%Y_%m}"
+
+
+def _month_range(month: date):
+    start = datetime.combine(month, time.min)
+    end = datetime.combine(add_months(month, 1), time.min)
+    return RunLog.created_at >= start, RunLog.created_at < end
+
+
+def _is_postgres(conn: AsyncConnection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+async def list_partitions(conn: AsyncConnection) -> List[date]:
+    """
+    Months that currently have a run_logs partition.
+    """
+    names = await conn.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'run_logs'"
+        )
+    )
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+async def ensure_partitions(conn: AsyncConnection, first: date, last: date) -> None:
+    """
+    Create the monthly partitions from `first` through `last` if missing.
+    """
+    month = first
+    while month <= last:
+        next_month = add_months(month, 1)
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+                f"PARTITION OF run_logs FOR VALUES FROM ('{month.isoformat()}') "
+                f"TO ('{next_month.isoformat()}')"
+            )
+        )
+        month = next_month
+
+
+async def expired_months(conn: AsyncConnection, cutoff: date) -> List[date]:
+    """
+    Months before `cutoff` that still hold run logs (or, on Postgres, still
+    have a partition).
+    """
+    months = set()
+    if _is_postgres(conn):
+        months.update(month for month in await list_partitions(conn) if month < cutoff)
+        # Only the small default partition is scanned, never the monthly ones
+        oldest = await conn.scalar(text("SELECT min(created_at) FROM run_logs_default"))
+    else:
+        oldest = await conn.scalar(select(func.min(RunLog.created_at)))
+    if oldest is not None:
+        month = oldest.date().replace(day=1)
+        while month < cutoff:
+            months.add(month)
+            month = add_months(month, 1)
+    return sorted(months)
+
+
+async def export_month(month: date, path: str) -> int:
+    """
+    Stream a month of run logs into a gzipped CSV at `path` and return the
+    number of rows written. No file is left behind for an empty month.
+    """
+    columns = [column.name for column in RunLog.__table__.columns]
+    query = select(RunLog.__table__).where(*_month_range(month))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial_path = path + ".partial"
+    count = 0
+    archive = gzip.open(partial_path, "wt", newline="", encoding="utf-8")
+    try:
+        writer = csv.writer(archive)
+        writer.writerow(columns)
+        async with engine.connect() as conn:
+            result = await conn.stream(query)
+            async for rows in result.partitions(ARCHIVE_CHUNK_SIZE):
+                await run_in_threadpool(writer.writerows, rows)
+                count += len(rows)
+    finally:
+        archive.close()
+    if count:
+        os.replace(partial_path, path)
+    else:
+        os.remove(partial_path)
+    return count
+
+
+async def archive_month(month: date, archive_dir: str = RUN_LOG_ARCHIVE_DIR) -> int:
+    """
+    Roll up, export and drop one month of run logs. Returns the number of rows
+    archived.
+    """
+    async with SessionLocal() as db:
+        await rollup_crud.rollup_run_logs(db, month, add_months(month, 1))
+
+    count = await export_month(
+        month, os.path.join(archive_dir, f"{partition_name(month)}.csv.gz")
+    )
+
+    async with engine.begin() as conn:
+        if _is_postgres(conn) and month in await list_partitions(conn):
+            name = partition_name(month)
+            await conn.execute(text(f"ALTER TABLE run_logs DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+        # Rows of the month outside its partition (e.g. in the default one)
+        await conn.execute(delete(RunLog).where(*_month_range(month)))
+    return count
+
+
+async def refresh_rollups(today: date) -> None:
+    """
+    Recompute the rollups of every day since the last rolled-up day (at least
+    yesterday and today).
+    """
+    async with SessionLocal() as db:
+        last_day = await db.scalar(select(func.max(RunLogDailyRollup.day)))
+        yesterday = today - timedelta(days=1)
+        start = min(last_day, yesterday) if last_day else yesterday
+        await rollup_crud.rollup_run_logs(db, start, today + timedelta(days=1))
+
+
+class RunLogMaintenance:
+    """
+    Background task running a maintenance pass every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        interval: float = RUN_LOG_MAINTENANCE_INTERVAL,
+        retention_months: int = RUN_LOG_RETENTION_MONTHS,
+        archive_dir: str = RUN_LOG_ARCHIVE_DIR,
+    ):
+        self.interval = interval
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_once(self) -> None:
+        conn = await engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if _is_postgres(conn):
+                locked = await conn.scalar(
+                    text("SELECT pg_try_advisory_lock(:key)"),
+                    {"key": _ADVISORY_LOCK_KEY},
+                )
+                if not locked:
+                    logger.info("Run log maintenance already running elsewhere")
+                    return
+            try:
+                await self._maintain()
+            finally:
+                if _is_postgres(conn):
+                    await conn.execute(
+                        text("SELECT pg_advisory_unlock(:key)"),
+                        {"key": _ADVISORY_LOCK_KEY},
+                    )
+        finally:
+            await conn.close()
+
+    async def _maintain(self) -> None:
+        today = datetime.utcnow().date()
+        this_month = today.replace(day=1)
+        async with engine.begin() as conn:
+            if _is_postgres(conn):
+                await ensure_partitions(
+                    conn, this_month, add_months(this_month, RUN_LOG_PARTITIONS_AHEAD)
+                )
+
+        await refresh_rollups(today)
+
+        if self.retention_months <= 0:
+            return
+        cutoff = add_months(this_month, -self.retention_months)
+        async with engine.connect() as conn:
+            months = await expired_months(conn, cutoff)
+        for month in months:
+            count = await archive_month(month, self.archive_dir)
+            logger.info("Archived %s run logs from %s", count, f"{month:%Y-%m}")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Run log maintenance failed")
+            await asyncio.sleep(self.interval)
+
+
+run_log_maintenance = RunLogMaintenance()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_log_maintenance.run_once())
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional
+import anyio
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from crud import run_log as run_log_crud
+from schemas.run_log import RunLogCreate
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Flush once this many run logs are buffered
+RUN_LOG_BATCH_SIZE = int(os.getenv("RUN_LOG_BATCH_SIZE", "100"))
+# Flush buffered run logs at least this often (seconds)
+RUN_LOG_FLUSH_INTERVAL = float(os.getenv("RUN_LOG_FLUSH_INTERVAL", "1.0"))
+
+
+class RunLogWriter:
+    """
+    Write-behind buffer for run logs.
+
+    Rows are accumulated and written with one multi-row INSERT when the buffer
+    reaches `batch_size`, every `flush_interval` seconds, and when the writer
+    is closed. Use it as an async context manager so the final flush happens
+    whether the run completes or fails::
+
+        async with RunLogWriter() as writer:
+            await writer.add(run_log)
+
+    The writer opens its own session for each flush, so it never shares the
+    request's session.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = RUN_LOG_BATCH_SIZE,
+        flush_interval: Optional[float] = RUN_LOG_FLUSH_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[RunLogCreate] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "RunLogWriter":
+        if self.flush_interval:
+            self._task = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._task:
+            self._task.cancel()
+        # Shield the final flush so a cancelled request still persists its logs
+        with anyio.CancelScope(shield=True):
+            await self.flush()
+
+    async def add(self, run_log: RunLogCreate) -> None:
+        self._buffer.append(run_log)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            try:
+                await self._write(rows)
+            except Exception:
+                # Keep the rows so the next flush retries them
+                self._buffer[:0] = rows
+                raise
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush run logs")
+
+    @staticmethod
+    async def _write(rows: List[RunLogCreate]) -> None:
+        async with SessionLocal() as db:
+            await run_log_crud.create_run_logs(db, rows)
@@ -0,0 +1,203 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple
+from openai import OpenAIError
+from dotenv import load_dotenv
+
+from models.test_case import TestCase
+from schemas.run import RunTestCase
+from schemas.run_log import RunLogCreate
+from utils import llm
+from utils.run_log_writer import RunLogWriter
+from utils.metrics import runs_in_progress
+
+load_dotenv()
+
+# Maximum number of completion calls in flight for a single run
+RUN_MAX_CONCURRENCY = int(os.getenv("RUN_MAX_CONCURRENCY", "8"))
+
+
+def run_concurrency(requested: Optional[int] = None) -> int:
+    """
+    Resolve the per-run concurrency limit, capped at RUN_MAX_CONCURRENCY.
+    """
+    if requested is None:
+        return RUN_MAX_CONCURRENCY
+    return max(1, min(requested, RUN_MAX_CONCURRENCY))
+
+
+async def run_test_case(
+    system_prompt: str,
+    tc: TestCase,
+    bypass_cache: bool = False,
+    params: llm.SamplingParams = llm.DEFAULT_SAMPLING,
+    samples: int = 1,
+) -> List[RunTestCase]:
+    """
+    Sample `samples` outputs for a test case, one result per sample. A failed
+    call yields a single error result.
+    """
+    try:
+        completions = await llm.complete(
+            system_prompt,
+            tc.user_message,
+            bypass_cache=bypass_cache,
+            params=params,
+            n=samples,
+        )
+        return [
+            RunTestCase(
+                test_case_id=tc.id,
+                sample_index=sample_index,
+                user_message=tc.user_message,
+                output=completion.output,
+                cached=completion.cached,
+                prompt_tokens=completion.prompt_tokens,
+                completion_tokens=completion.completion_tokens,
+                latency_ms=completion.latency_ms,
+                finish_reason=completion.finish_reason,
+            )
+            for sample_index, completion in enumerate(completions)
+        ]
+    except OpenAIError as e:
+        return [
+            RunTestCase(
+                test_case_id=tc.id,
+                user_message=tc.user_message,
+                output=f"OpenAI Error: {str(e)}",
+                error=True,
+            )
+        ]
+    except Exception as e:
+        return [
+            RunTestCase(
+                test_case_id=tc.id,
+                user_message=tc.user_message,
+                output=f"Internal Error: {str(e)}",
+                error=True,
+            )
+        ]
+
+
+@dataclass
+class RunCell:
+    """
+    One model call of a run: a system prompt applied to a test case.
+    """
+
+    run_id: int
+    prompt_id: int
+    system_prompt: str
+    test_case: TestCase
+
+
+async def iter_cells(
+    cells: List[RunCell],
+    max_concurrency: Optional[int] = None,
+    bypass_cache: bool = False,
+    params: llm.SamplingParams = llm.DEFAULT_SAMPLING,
+    samples: int = 1,
+) -> AsyncIterator[Tuple[RunCell, RunTestCase]]:
+    """
+    Execute every cell concurrently through one shared pool of at most
+    `max_concurrency` in-flight calls, yielding each result (one per sample)
+    as soon as its call completes. Pending calls are cancelled if the consumer
+    stops iterating early (e.g. the client disconnects).
+    """
+    semaphore = asyncio.Semaphore(run_concurrency(max_concurrency))
+
+    async def bounded(cell: RunCell) -> Tuple[RunCell, List[RunTestCase]]:
+        async with semaphore:
+            results = await run_test_case(
+                cell.system_prompt,
+                cell.test_case,
+                bypass_cache=bypass_cache,
+                params=params,
+                samples=samples,
+            )
+            return cell, results
+
+    tasks = [asyncio.ensure_future(bounded(cell)) for cell in cells]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            cell, results = await next_done
+            for result in results:
+                yield cell, result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def stream_cells(
+    user_id: int,
+    cells: List[RunCell],
+    max_concurrency: Optional[int] = None,
+    bypass_cache: bool = False,
+    params: llm.SamplingParams = llm.DEFAULT_SAMPLING,
+    samples: int = 1,
+) -> AsyncIterator[Tuple[RunCell, RunTestCase]]:
+    """
+    Execute cells that may belong to several runs, yielding each result as it
+    completes and persisting it as a run log through a write-behind
+    `RunLogWriter`.
+    """
+    run_count = len({cell.run_id for cell in cells})
+    runs_in_progress.inc(amount=run_count)
+    try:
+        async with RunLogWriter() as writer:
+            async for cell, result in iter_cells(
+                cells,
+                max_concurrency=max_concurrency,
+                bypass_cache=bypass_cache,
+                params=params,
+                samples=samples,
+            ):
+                await writer.add(
+                    RunLogCreate(
+                        user_id=user_id,
+                        prompt_id=cell.prompt_id,
+                        system_prompt=cell.system_prompt,
+                        user_message=result.user_message,
+                        response=result.output,
+                        run_id=cell.run_id,
+                        test_case_id=result.test_case_id,
+                        sample_index=result.sample_index,
+                        error=result.error,
+                        cached=result.cached,
+                        prompt_tokens=result.prompt_tokens,
+                        completion_tokens=result.completion_tokens,
+                        latency_ms=result.latency_ms,
+                        finish_reason=result.finish_reason,
+                    )
+                )
+                yield cell, result
+    finally:
+        runs_in_progress.dec(amount=run_count)
+
+
+async def stream_run(
+    run_id: int,
+    user_id: int,
+    prompt_id: int,
+    system_prompt: str,
+    test_cases: List[TestCase],
+    max_concurrency: Optional[int] = None,
+    bypass_cache: bool = False,
+    params: llm.SamplingParams = llm.DEFAULT_SAMPLING,
+    samples: int = 1,
+) -> AsyncIterator[RunTestCase]:
+    """
+    Execute a single run, yielding each result as it completes and persisting
+    it as a run log.
+    """
+    cells = [RunCell(run_id, prompt_id, system_prompt, tc) for tc in test_cases]
+    async for _, result in stream_cells(
+        user_id,
+        cells,
+        max_concurrency=max_concurrency,
+        bypass_cache=bypass_cache,
+        params=params,
+        samples=samples,
+    ):
+        yield result
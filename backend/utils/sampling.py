@@ -0,0 +1,48 @@
+"""
+Deterministic test case samples for fast-feedback runs.
+
+Each test case gets a rank from a hash of the sample seed and its id, and a
+sample of fraction f holds the ceil(f * n) lowest-ranked cases. For the same
+seed a sample is therefore stable across runs and prompt edits (runs of
+different system prompts compare like for like), and a larger fraction
+contains every smaller one. With `changed_first`, test cases whose latest
+output changed are taken first, most recently changed first.
+"""
+
+import hashlib
+import math
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import run_log as run_log_crud
+from models.test_case import TestCase
+
+
+def sample_rank(seed: int, test_case_id: int) -> bytes:
+    return hashlib.sha256(f"{seed}:{test_case_id}".encode("utf-8")).digest()
+
+
+def sample_size(fraction: float, total: int) -> int:
+    return min(total, max(1, math.ceil(fraction * total)))
+
+
+async def sample_test_cases(
+    db: AsyncSession,
+    prompt_id: int,
+    test_cases: List[TestCase],
+    fraction: float,
+    seed: int,
+    changed_first: bool = False,
+) -> List[TestCase]:
+    """
+    Pick the sample of `test_cases`, returned in id order.
+    """
+    ranked = sorted(test_cases, key=lambda tc: sample_rank(seed, tc.id))
+    if changed_first:
+        changed = await run_log_crud.get_changed_test_case_ids(db, prompt_id)
+        priority = {test_case_id: i for i, test_case_id in enumerate(changed)}
+        # Stable, so the rest keep their seeded order
+        ranked.sort(key=lambda tc: priority.get(tc.id, len(priority)))
+    sample = ranked[: sample_size(fraction, len(test_cases))]
+    return sorted(sample, key=lambda tc: tc.id)
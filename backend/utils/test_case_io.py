@@ -0,0 +1,211 @@
+"""
+Bulk import and export of test cases as NDJSON or CSV.
+
+Imports are parsed from the request body as it arrives and inserted in
+multi-row chunks inside one transaction: either every row is stored or, if
+any row is invalid, none is. Exports stream rows from a server-side cursor.
+"""
+
+import codecs
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import prompt as prompt_crud
+from crud import test_case as test_case_crud
+from schemas.test_case import TestCaseCreate
+
+load_dotenv()
+
+# Rows per multi-row INSERT during an import
+TEST_CASE_IMPORT_CHUNK_SIZE = int(os.getenv("TEST_CASE_IMPORT_CHUNK_SIZE", "500"))
+# Stop parsing an import after this many invalid rows
+MAX_IMPORT_ERRORS = 20
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_COLUMNS = ("id", "user_message")
+
+
+class TestCaseImportError(Exception):
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+
+
+def import_format(content_type: Optional[str]) -> Optional[str]:
+    """
+    Map a request Content-Type to an import format; JSON lines by default.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    if media_type in (
+        "",
+        "application/x-ndjson",
+        "application/jsonl",
+        "application/json",
+        "text/plain",
+    ):
+        return "ndjson"
+    return None
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decode a UTF-8 byte stream into lines ending in "\n" ("\r\n" included).
+    Only "\n" ends a line: other Unicode line breaks, such as U+2028, may
+    appear inside a JSON string or CSV field. Invalid UTF-8 raises
+    TestCaseImportError.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_number = 0
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                line_number += 1
+                yield line.removesuffix("\r") + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        # The undecoded bytes hold the rest of the current line and any after
+        line_number += 1 + e.object[: e.start].count(b"\n")
+        raise TestCaseImportError([{"line": line_number, "error": "Invalid UTF-8"}])
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+# Records are yielded as (line number, fields, parse error)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def _iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+async def _iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    header = None
+    record_text = ""
+    line_number = 0
+    record_line = 1
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        record_text += line
+        # A quoted field may span lines; a record ends on an even quote count
+        if record_text.count('"') % 2:
+            continue
+        text, record_text = record_text, ""
+        start, record_line = record_line, line_number + 1
+        if not text.strip():
+            continue
+        try:
+            row = next(csv.reader([text]))
+        except csv.Error as e:
+            error = f"Invalid CSV: {e}"
+            if header is None:
+                raise TestCaseImportError([{"line": start, "error": error}])
+            yield start, None, error
+            continue
+        if header is None:
+            header = [name.strip() for name in row]
+            if "user_message" not in header:
+                raise TestCaseImportError(
+                    [{"line": start, "error": "CSV header must include user_message"}]
+                )
+            continue
+        yield start, dict(zip(header, row)), None
+    if record_text:
+        yield record_line, None, "Unterminated quoted field"
+
+
+async def import_test_cases(
+    db: AsyncSession, prompt_id: int, chunks: AsyncIterator[bytes], format: str
+) -> int:
+    """
+    Validate and insert every test case in the stream, returning the number
+    imported. Raises TestCaseImportError (after rolling back) listing the
+    invalid rows if any row fails validation.
+    """
+    records = _iter_csv(chunks) if format == "csv" else _iter_ndjson(chunks)
+    errors: List[dict] = []
+    batch: List[str] = []
+    imported = 0
+    try:
+        async for line, record, error in records:
+            message = None
+            if error is None:
+                try:
+                    message = TestCaseCreate.model_validate(record).user_message
+                    error = None if message.strip() else "user_message is empty"
+                except ValidationError as e:
+                    error = "; ".join(
+                        f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+                        for detail in e.errors()
+                    )
+            if error:
+                errors.append({"line": line, "error": error})
+                if len(errors) >= MAX_IMPORT_ERRORS:
+                    break
+                continue
+            if errors:
+                # Nothing will be stored; keep validating the rest
+                continue
+            batch.append(message)
+            if len(batch) >= TEST_CASE_IMPORT_CHUNK_SIZE:
+                await test_case_crud.add_test_cases(db, prompt_id, batch)
+                imported += len(batch)
+                batch = []
+        if errors:
+            raise TestCaseImportError(errors)
+        if batch:
+            await test_case_crud.add_test_cases(db, prompt_id, batch)
+            imported += len(batch)
+        if imported:
+            await prompt_crud.bump_revision(db, prompt_id)
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    return imported
+
+
+async def export_test_cases(
+    db: AsyncSession, prompt_id: int, format: str
+) -> AsyncIterator[str]:
+    """
+    Yield a prompt's test cases in id order as NDJSON lines or CSV text.
+    """
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+    async for rows in test_case_crud.stream_test_cases(db, prompt_id):
+        if format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows
+            )
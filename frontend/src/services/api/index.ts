@@ -3,4 +3,5 @@ export * from "./prompts";
 export * from "./testCases";
 export * from "./versions";
 export * from "./run";
+export * from "./pagination";
 export { default as api } from "./config";
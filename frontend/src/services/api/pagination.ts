@@ -0,0 +1,20 @@
+import api from "./config";
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+// Fetch every page of a keyset-paginated list endpoint
+export const getAllPages = async <T>(url: string): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const response: { data: Page<T> } = await api.get<Page<T>>(url, {
+      params: cursor ? { cursor } : undefined,
+    });
+    items.push(...response.data.items);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return items;
+};
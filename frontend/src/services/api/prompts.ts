@@ -1,4 +1,5 @@
 import api from "./config";
+import { getAllPages } from "./pagination";
 
 export interface Prompt {
   id: number;
@@ -7,9 +8,19 @@ export interface Prompt {
   created_at: string;
 }
 
+export interface PromptSummary extends Prompt {
+  test_case_count: number;
+  latest_version: number | null;
+  last_run_at: string | null;
+}
+
 export const promptsApi = {
   getAllPrompts: async (): Promise<Prompt[]> => {
-    const response = await api.get<Prompt[]>("/prompts");
+    return getAllPages<Prompt>("/prompts");
+  },
+
+  getPromptSummaries: async (): Promise<PromptSummary[]> => {
+    const response = await api.get<PromptSummary[]>("/prompts/summary");
     return response.data;
   },
 
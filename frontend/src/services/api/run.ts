@@ -2,22 +2,93 @@ import api from "./config";
 
 export interface RunResult {
   test_case_id: number;
+  sample_index: number;
   user_message: string;
   output: string;
 }
 
+export interface TestCaseVariance {
+  test_case_id: number;
+  samples: number;
+  errors: number;
+  distinct_outputs: number;
+  mean_similarity: number | null;
+}
+
 export interface RunResponse {
+  run_id: number | null;
   results: RunResult[];
+  variance: TestCaseVariance[] | null;
+}
+
+export interface RunSampleOptions {
+  sample_fraction?: number;
+  sample_seed?: number;
+  sample_changed_first?: boolean;
+  temperature?: number;
+  top_p?: number;
+  max_tokens?: number;
+  seed?: number;
+  samples_per_case?: number;
+}
+
+export interface RunStatus {
+  id: number;
+  prompt_id: number | null;
+  mode: string;
+  status: string;
+  total: number;
+  completed: number;
+  errors: number;
+  sample_fraction: number | null;
+  sample_seed: number | null;
+  temperature: number;
+  top_p: number | null;
+  max_tokens: number | null;
+  seed: number | null;
+  samples_per_case: number;
+  batch_id: string | null;
 }
 
 export const runApi = {
   runPrompt: async (
     promptId: number,
-    systemPrompt: string
+    systemPrompt: string,
+    sample: RunSampleOptions = {}
   ): Promise<RunResponse> => {
     const response = await api.post<RunResponse>(`/run/prompt/${promptId}`, {
       system_prompt: systemPrompt,
+      ...sample,
+    });
+    return response.data;
+  },
+
+  submitBatchRun: async (
+    promptId: number,
+    systemPrompt: string,
+    options: RunSampleOptions = {}
+  ): Promise<RunStatus> => {
+    const response = await api.post<RunStatus>(`/run/prompt/${promptId}/batch`, {
+      system_prompt: systemPrompt,
+      ...options,
     });
     return response.data;
   },
+
+  completeSampleRun: async (runId: number): Promise<RunStatus> => {
+    const response = await api.post<RunStatus>(`/run/jobs/${runId}/complete`);
+    return response.data;
+  },
+
+  getRunStatus: async (runId: number): Promise<RunStatus> => {
+    const response = await api.get<RunStatus>(`/run/jobs/${runId}`);
+    return response.data;
+  },
+
+  getRunVariance: async (runId: number): Promise<TestCaseVariance[]> => {
+    const response = await api.get<TestCaseVariance[]>(
+      `/run/jobs/${runId}/variance`
+    );
+    return response.data;
+  },
 };
@@ -1,4 +1,5 @@
 import api from "./config";
+import { getAllPages } from "./pagination";
 
 export interface TestCase {
   id: number;
@@ -12,12 +13,11 @@ export interface CreateTestCaseData {
   expected_output: string;
 }
 
+export type TestCaseFileFormat = "ndjson" | "csv";
+
 export const testCasesApi = {
   getAllTestCases: async (promptId: number): Promise<TestCase[]> => {
-    const response = await api.get<TestCase[]>(
-      `/test-cases/prompt/${promptId}`
-    );
-    return response.data;
+    return getAllPages<TestCase>(`/test-cases/prompt/${promptId}`);
   },
 
   getTestCase: async (testCaseId: number): Promise<TestCase> => {
@@ -39,4 +39,33 @@ export const testCasesApi = {
   deleteTestCase: async (testCaseId: number): Promise<void> => {
     await api.delete(`/test-cases/${testCaseId}`);
   },
+
+  importTestCases: async (
+    promptId: number,
+    file: Blob,
+    format: TestCaseFileFormat
+  ): Promise<{ imported: number }> => {
+    const response = await api.post<{ imported: number }>(
+      `/test-cases/prompt/${promptId}/import?format=${format}`,
+      file,
+      {
+        headers: {
+          "Content-Type":
+            format === "csv" ? "text/csv" : "application/x-ndjson",
+        },
+      }
+    );
+    return response.data;
+  },
+
+  exportTestCases: async (
+    promptId: number,
+    format: TestCaseFileFormat = "ndjson"
+  ): Promise<Blob> => {
+    const response = await api.get<Blob>(
+      `/test-cases/prompt/${promptId}/export?format=${format}`,
+      { responseType: "blob" }
+    );
+    return response.data;
+  },
 };
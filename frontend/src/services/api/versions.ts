@@ -1,4 +1,5 @@
 import api from "./config";
+import { getAllPages } from "./pagination";
 
 export interface Version {
   id: number;
@@ -13,6 +14,31 @@ export interface CreateVersionData {
   content: string;
 }
 
+export interface DiffSegment {
+  op: "equal" | "delete" | "insert";
+  text: string;
+}
+
+export interface TestCaseDiff {
+  test_case_id: number;
+  user_message: string | null;
+  from_run_id: number;
+  to_run_id: number;
+  from_error: boolean;
+  to_error: boolean;
+  similarity: number;
+  segments: DiffSegment[];
+}
+
+export interface VersionDiff {
+  from_version_id: number;
+  to_version_id: number;
+  similarity: number | null;
+  changed: number;
+  test_cases: TestCaseDiff[];
+  unpaired_test_case_ids: number[];
+}
+
 export const versionsApi = {
   getAllVersions: async (promptId: number): Promise<Version[]> => {
     const response = await api.get<Version[]>(
@@ -59,7 +85,16 @@ export const versionsApi = {
   },
 
   getVersionsByPromptId: async (promptId: number): Promise<Version[]> => {
-    const response = await api.get<Version[]>(`/versions/prompt/${promptId}`);
+    return getAllPages<Version>(`/versions/prompt/${promptId}`);
+  },
+
+  diffVersions: async (
+    fromVersionId: number,
+    toVersionId: number
+  ): Promise<VersionDiff> => {
+    const response = await api.get<VersionDiff>(
+      `/versions/${fromVersionId}/diff/${toVersionId}`
+    );
     return response.data;
   },
 };